@@ -13,6 +13,9 @@ from app.db.base import Base
 # IMPORTANT: import models so Alembic sees them
 from app.models import user, task, team
 from app.models import team_member
+from app.models import task_counter
+from app.models import team_daily_stat
+from app.models import scope_version
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,45 @@
+"""add composite indexes for personal/team today queries
+
+Revision ID: 3a7d9e1c4b62
+Revises: 8c4e2a7f1d3b
+Create Date: 2026-10-17 12:20:05.614388
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3a7d9e1c4b62"
+down_revision: Union[str, None] = "8c4e2a7f1d3b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # личные задачи: owner_user_id = ? AND team_id IS NULL AND status/due_at
+    op.create_index(
+        "ix_tasks_personal_owner_status_due_at",
+        "tasks",
+        ["owner_user_id", "status", "due_at"],
+        unique=False,
+        postgresql_where=sa.text("team_id IS NULL"),
+    )
+    # командные задачи: team_id = ? AND status/due_at
+    op.create_index(
+        "ix_tasks_team_status_due_at",
+        "tasks",
+        ["team_id", "status", "due_at"],
+        unique=False,
+    )
+    # (team_id, ...) покрывает и поиск по team_id, одиночный индекс лишний
+    op.drop_index("ix_tasks_team_id", table_name="tasks")
+
+
+def downgrade() -> None:
+    op.create_index("ix_tasks_team_id", "tasks", ["team_id"], unique=False)
+    op.drop_index("ix_tasks_team_status_due_at", table_name="tasks")
+    op.drop_index("ix_tasks_personal_owner_status_due_at", table_name="tasks")
@@ -0,0 +1,32 @@
+"""add tasks (status, due_at) index for reminder window
+
+Revision ID: 5b1f3c2d9e7a
+Revises: 2badfc088920
+Create Date: 2026-10-17 10:12:41.201733
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b1f3c2d9e7a"
+down_revision: Union[str, None] = "2badfc088920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_tasks_status_due_at",
+        "tasks",
+        ["status", "due_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_status_due_at", table_name="tasks")
@@ -0,0 +1,62 @@
+"""add reminded_at / reminder lease to tasks
+
+Revision ID: 8c4e2a7f1d3b
+Revises: 5b1f3c2d9e7a
+Create Date: 2026-10-17 11:03:27.518402
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e2a7f1d3b"
+down_revision: Union[str, None] = "5b1f3c2d9e7a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("reminded_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "tasks", sa.Column("remind_lease_until", sa.DateTime(), nullable=True)
+    )
+    op.add_column(
+        "tasks", sa.Column("remind_lease_owner", sa.String(length=64), nullable=True)
+    )
+
+    # уже прошедшие задачи считаем отправленными, иначе воркеры
+    # после деплоя разошлют напоминания за всю историю.
+    # due_at хранится naive в APP_TZ, поэтому и now() приводим к APP_TZ
+    op.execute(
+        sa.text(
+            "UPDATE tasks SET reminded_at = due_at "
+            "WHERE due_at < (now() AT TIME ZONE :tz)"
+        ).bindparams(tz=os.getenv("APP_TZ", "UTC"))
+    )
+
+    op.create_index(
+        "ix_tasks_remind_pending",
+        "tasks",
+        ["due_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'todo' AND reminded_at IS NULL"),
+    )
+    # окно (/tasks/due) и claim теперь идут по ix_tasks_remind_pending,
+    # а (status, due_at) больше ни одному запросу не нужен — только
+    # лишняя запись на каждый INSERT/UPDATE tasks
+    op.drop_index("ix_tasks_status_due_at", table_name="tasks")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_tasks_status_due_at", "tasks", ["status", "due_at"], unique=False
+    )
+    op.drop_index("ix_tasks_remind_pending", table_name="tasks")
+    op.drop_column("tasks", "remind_lease_owner")
+    op.drop_column("tasks", "remind_lease_until")
+    op.drop_column("tasks", "reminded_at")
@@ -0,0 +1,42 @@
+"""add task_counters (per user/team, per status)
+
+Revision ID: 9e2b7c4d1a58
+Revises: 3a7d9e1c4b62
+Create Date: 2026-10-17 14:02:51.337120
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9e2b7c4d1a58"
+down_revision: Union[str, None] = "3a7d9e1c4b62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_counters",
+        sa.Column("scope", sa.String(length=8), nullable=False),
+        sa.Column("scope_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "scope_id", "status"),
+    )
+
+    # стартовые значения из существующих задач
+    op.execute(
+        "INSERT INTO task_counters (scope, scope_id, status, count) "
+        "SELECT CASE WHEN team_id IS NULL THEN 'user' ELSE 'team' END, "
+        "COALESCE(team_id, owner_user_id), status, count(*) "
+        "FROM tasks GROUP BY 1, 2, 3"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_counters")
@@ -0,0 +1,43 @@
+"""add tasks.done_at and team_daily_stats rollup
+
+Revision ID: c5a1e8f0b2d4
+Revises: 9e2b7c4d1a58
+Create Date: 2026-10-17 15:11:08.902114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5a1e8f0b2d4"
+down_revision: Union[str, None] = "9e2b7c4d1a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # у уже закрытых задач время закрытия неизвестно -> NULL,
+    # статистика копится с момента деплоя
+    op.add_column("tasks", sa.Column("done_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "team_daily_stats",
+        sa.Column("team_id", sa.Integer(), nullable=False),
+        sa.Column("member_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("done_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["team_id"], ["teams.id"]),
+        sa.ForeignKeyConstraint(
+            ["member_id"], ["team_members.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("team_id", "member_id", "day"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("team_daily_stats")
+    op.drop_column("tasks", "done_at")
@@ -0,0 +1,33 @@
+"""add scope_versions for today ETags
+
+Revision ID: e7b3d1a9c6f2
+Revises: c5a1e8f0b2d4
+Create Date: 2026-10-17 16:02:41.517390
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b3d1a9c6f2"
+down_revision: Union[str, None] = "c5a1e8f0b2d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scope_versions",
+        sa.Column("scope", sa.String(length=8), nullable=False),
+        sa.Column("scope_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "scope_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("scope_versions")
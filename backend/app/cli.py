@@ -0,0 +1,42 @@
+"""
+Служебные команды backend.
+
+    python -m app.cli rebuild-counters     # пересчитать task_counters из tasks
+    python -m app.cli rebuild-team-stats   # пересчитать team_daily_stats из tasks
+"""
+
+import argparse
+import asyncio
+
+from app.db.database import SessionLocal
+from app.repository.task_counters import TaskCounterRepository
+from app.repository.team_stats import TeamStatsRepository
+
+
+async def rebuild_counters() -> None:
+    async with SessionLocal() as db:
+        rows = await TaskCounterRepository.rebuild(db)
+    print(f"task_counters rebuilt: {rows} rows")
+
+
+async def rebuild_team_stats() -> None:
+    async with SessionLocal() as db:
+        rows = await TeamStatsRepository.rebuild(db)
+    print(f"team_daily_stats rebuilt: {rows} rows")
+
+
+COMMANDS = {
+    "rebuild-counters": rebuild_counters,
+    "rebuild-team-stats": rebuild_team_stats,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == "__main__":
+    main()
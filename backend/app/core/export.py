@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+# порядок колонок в CSV и ключей в NDJSON
+EXPORT_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "due_at",
+    "status",
+    "team_id",
+    "created_by",
+    "done_by_nickname",
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_ndjson(rows: Sequence) -> bytes:
+    """Пачка строк -> NDJSON (по JSON-объекту на строку)."""
+    return "".join(
+        json.dumps(
+            {k: _plain(v) for k, v in zip(EXPORT_FIELDS, row)}, ensure_ascii=False
+        )
+        + "\n"
+        for row in rows
+    ).encode()
+
+
+def encode_csv(rows: Sequence, *, header: bool = False) -> bytes:
+    """Пачка строк -> CSV; header=True добавляет строку с названиями колонок."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buf.getvalue().encode()
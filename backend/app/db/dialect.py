@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def upsert_insert(db: AsyncSession, entity):
+    """
+    INSERT с поддержкой ON CONFLICT под диалект сессии.
+
+    Прод — PostgreSQL, тесты — SQLite: у обоих есть
+    on_conflict_do_nothing / on_conflict_do_update и RETURNING.
+    """
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert(entity)
+    return postgresql.insert(entity)
+
+
+def plus_days(db: AsyncSession, column, days: int):
+    """
+    SQL-выражение `column + days` для DateTime-колонки.
+
+    В SQLite datetime хранится строкой "YYYY-MM-DD HH:MM:SS.ffffff":
+    сдвигаем дату через strftime и возвращаем исходные микросекунды,
+    чтобы формат (и сравнение строк) не поменялся.
+    """
+    if db.bind.dialect.name == "sqlite":
+        return func.strftime(
+            "%Y-%m-%d %H:%M:%S", column, f"{days:+d} days"
+        ).concat(func.substr(column, 20))
+    return column + timedelta(days=days)
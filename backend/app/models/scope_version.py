@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ScopeVersion(Base):
+    """
+    Версия задач владельца (личные) или команды.
+
+    Увеличивается в каждой транзакции, которая меняет задачи этого scope;
+    из неё строится ETag для today-списков.
+    """
+
+    __tablename__ = "scope_versions"
+
+    # scope/scope_id — как в task_counters
+    scope: Mapped[str] = mapped_column(String(8), primary_key=True)
+    scope_id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False
+    )
+    version: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey, Text, Integer
+from sqlalchemy import String, DateTime, ForeignKey, Text, Integer, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -9,6 +9,27 @@ from app.db.base import Base
 class Task(Base):
     __tablename__ = "tasks"
 
+    __table_args__ = (
+        # окно и очередь напоминаний: ещё не отправленные open-задачи
+        Index(
+            "ix_tasks_remind_pending",
+            "due_at",
+            postgresql_where=text("status = 'todo' AND reminded_at IS NULL"),
+            sqlite_where=text("status = 'todo' AND reminded_at IS NULL"),
+        ),
+        # today / счётчики по личным задачам (team_id IS NULL)
+        Index(
+            "ix_tasks_personal_owner_status_due_at",
+            "owner_user_id",
+            "status",
+            "due_at",
+            postgresql_where=text("team_id IS NULL"),
+            sqlite_where=text("team_id IS NULL"),
+        ),
+        # today по команде
+        Index("ix_tasks_team_status_due_at", "team_id", "status", "due_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(120))
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -22,7 +43,6 @@ class Task(Base):
     team_id: Mapped[int | None] = mapped_column(
         ForeignKey("teams.id"),
         nullable=True,
-        index=True,
     )
 
     # NEW: who completed task (team member)
@@ -32,6 +52,16 @@ class Task(Base):
         index=True,
     )
 
+    # когда задачу закрыли (naive, APP_TZ — как due_at); для статистики команды
+    done_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    # напоминания: когда отправлено + аренда (lease) воркера, который его шлёт
+    reminded_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    remind_lease_until: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+    remind_lease_owner: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
     done_by_member: Mapped["TeamMember | None"] = relationship(
         "TeamMember",
         lazy="selectin",
@@ -0,0 +1,23 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class TaskCounter(Base):
+    """
+    Сколько задач в каждом статусе у владельца (личные) или у команды.
+
+    Обновляется в тех же транзакциях, что и сами задачи;
+    пересчёт с нуля — `python -m app.cli rebuild-counters`.
+    """
+
+    __tablename__ = "task_counters"
+
+    # "user" -> scope_id = users.id (личные задачи), "team" -> scope_id = teams.id
+    scope: Mapped[str] = mapped_column(String(8), primary_key=True)
+    scope_id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False
+    )
+    status: Mapped[str] = mapped_column(String(16), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,25 @@
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class TeamDailyStat(Base):
+    """
+    Сколько командных задач закрыл участник за день (день — по done_at в APP_TZ).
+
+    Копится инкрементально при закрытии задач, поэтому статистика команды
+    не делает GROUP BY по всей tasks. Пересчёт с нуля —
+    `python -m app.cli rebuild-team-stats`.
+    """
+
+    __tablename__ = "team_daily_stats"
+
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id"), primary_key=True)
+    member_id: Mapped[int] = mapped_column(
+        ForeignKey("team_members.id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    done_count: Mapped[int] = mapped_column(Integer, default=0)
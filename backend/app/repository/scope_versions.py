@@ -0,0 +1,42 @@
+from collections.abc import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.dialect import upsert_insert
+from app.models.scope_version import ScopeVersion
+
+
+class ScopeVersionRepository:
+    @staticmethod
+    async def bump(db: AsyncSession, scopes: Iterable[tuple[str, int]]) -> None:
+        """
+        +1 к версии каждого (scope, scope_id) одним upsert. Не коммитит.
+
+        Ключи сортируются — тот же порядок блокировок, что и у счётчиков.
+        """
+        rows = [
+            {"scope": scope, "scope_id": scope_id, "version": 1}
+            for scope, scope_id in sorted(set(scopes))
+        ]
+        if not rows:
+            return
+
+        table = ScopeVersion.__table__
+        stmt = upsert_insert(db, table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.scope_id],
+            set_={"version": table.c.version + 1},
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def get(db: AsyncSession, scope: str, scope_id: int) -> int:
+        """Текущая версия (0, если задачи scope ещё не менялись)."""
+        version = await db.scalar(
+            select(ScopeVersion.version).where(
+                ScopeVersion.scope == scope,
+                ScopeVersion.scope_id == scope_id,
+            )
+        )
+        return version or 0
@@ -0,0 +1,86 @@
+from collections import Counter
+
+from sqlalchemy import case, delete, func, insert, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.dialect import upsert_insert
+from app.models.task import Task
+from app.models.task_counter import TaskCounter
+
+
+SCOPE_USER = "user"
+SCOPE_TEAM = "team"
+
+# (scope, scope_id, status) -> на сколько изменить счётчик
+CounterDeltas = Counter[tuple[str, int, str]]
+
+
+def task_scope(task: Task) -> tuple[str, int]:
+    if task.team_id is None:
+        return SCOPE_USER, task.owner_user_id
+    return SCOPE_TEAM, task.team_id
+
+
+class TaskCounterRepository:
+    @staticmethod
+    async def apply(db: AsyncSession, deltas: CounterDeltas) -> None:
+        """
+        Применить изменения счётчиков одним INSERT ... ON CONFLICT DO UPDATE.
+
+        Не коммитит: вызывается внутри транзакции, которая меняет задачи.
+        Ключи сортируем, чтобы параллельные транзакции брали блокировки
+        строк в одном порядке (без дедлоков).
+        """
+        rows = [
+            {"scope": scope, "scope_id": scope_id, "status": status, "count": n}
+            for (scope, scope_id, status), n in sorted(deltas.items())
+            if n
+        ]
+        if not rows:
+            return
+
+        table = TaskCounter.__table__
+        stmt = upsert_insert(db, table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.scope_id, table.c.status],
+            set_={"count": table.c.count + stmt.excluded.count},
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def get(db: AsyncSession, scope: str, scope_id: int) -> dict[str, int]:
+        """status -> count для владельца/команды (O(число статусов))."""
+        res = await db.execute(
+            select(TaskCounter.status, TaskCounter.count).where(
+                TaskCounter.scope == scope,
+                TaskCounter.scope_id == scope_id,
+            )
+        )
+        return {status: count for status, count in res.all()}
+
+    @staticmethod
+    async def rebuild(db: AsyncSession) -> int:
+        """
+        Пересчитать все счётчики из tasks (починка расхождений).
+
+        В PostgreSQL таблица счётчиков блокируется на время пересчёта:
+        параллельные создания/закрытия задач подождут и применят свои
+        +1/-1 уже поверх пересчитанных значений.
+        """
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("LOCK TABLE task_counters IN EXCLUSIVE MODE"))
+
+        scope = case((Task.team_id.is_(None), literal(SCOPE_USER)), else_=SCOPE_TEAM)
+        scope_id = func.coalesce(Task.team_id, Task.owner_user_id)
+        source = select(scope, scope_id, Task.status, func.count()).group_by(
+            scope, scope_id, Task.status
+        )
+
+        await db.execute(delete(TaskCounter))
+        res = await db.execute(
+            insert(TaskCounter).from_select(
+                ["scope", "scope_id", "status", "count"], source
+            )
+        )
+        await db.commit()
+        return res.rowcount
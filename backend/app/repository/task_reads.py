@@ -0,0 +1,194 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task import Task
+from app.models.team_member import TeamMember
+
+
+@dataclass(frozen=True, slots=True)
+class TaskRecord:
+    """
+    Задача для ответа API (поля TaskOut), без ORM.
+
+    orjson сериализует slots-dataclass напрямую, Pydantic читает его
+    через from_attributes — как и Task.
+    """
+
+    id: int
+    title: str
+    description: str | None
+    due_at: datetime | None
+    status: str
+    created_by: int
+    owner_user_id: int
+    team_id: int | None
+    done_by_nickname: str | None
+
+
+# колонки в порядке полей TaskRecord; done_by_nickname — LEFT JOIN team_members
+_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.due_at,
+    Task.status,
+    Task.created_by,
+    Task.owner_user_id,
+    Task.team_id,
+    TeamMember.nickname.label("done_by_nickname"),
+)
+
+
+class TaskReadRepository:
+    """
+    Чтение задач только для ответа: явные колонки -> TaskRecord.
+
+    Ни identity map, ни unit of work, ни relationship-загрузчиков:
+    строки не попадают в сессию и не живут дольше запроса.
+    Для изменений по-прежнему TaskRepository.
+    """
+
+    @staticmethod
+    def _select() -> Select:
+        return select(*_COLUMNS).outerjoin(
+            TeamMember, TeamMember.id == Task.done_by_member_id
+        )
+
+    @staticmethod
+    async def _records(db: AsyncSession, stmt) -> list[TaskRecord]:
+        res = await db.execute(stmt)
+        return [TaskRecord(*row) for row in res]
+
+    @staticmethod
+    async def get_personal(
+        db: AsyncSession, *, task_id: int, owner_user_id: int
+    ) -> TaskRecord | None:
+        """Личная задача владельца по id (чужая -> None, как в TaskRepository)."""
+        records = await TaskReadRepository._records(
+            db,
+            TaskReadRepository._select().where(
+                Task.id == task_id,
+                Task.owner_user_id == owner_user_id,
+                Task.team_id.is_(None),
+            ),
+        )
+        return records[0] if records else None
+
+    @staticmethod
+    async def get_team(
+        db: AsyncSession, *, task_id: int, team_id: int
+    ) -> TaskRecord | None:
+        records = await TaskReadRepository._records(
+            db,
+            TaskReadRepository._select().where(
+                Task.id == task_id,
+                Task.team_id == team_id,
+            ),
+        )
+        return records[0] if records else None
+
+    @staticmethod
+    async def list_by_owner(
+        db: AsyncSession,
+        owner_user_id: int,
+        *,
+        before_id: int | None = None,
+        limit: int | None = None,
+    ) -> list[TaskRecord]:
+        """
+        Личные задачи владельца, новые сверху (id DESC).
+
+        Keyset-пагинация: before_id — id последней задачи предыдущей
+        страницы, limit — размер страницы (None — без ограничения).
+        """
+        stmt = (
+            TaskReadRepository._select()
+            .where(
+                Task.owner_user_id == owner_user_id,
+                Task.team_id.is_(None),
+            )
+            .order_by(Task.id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            stmt = stmt.where(Task.id < before_id)
+        return await TaskReadRepository._records(db, stmt)
+
+    @staticmethod
+    async def list_today_open_by_team(
+        db: AsyncSession,
+        team_id: int,
+        day_start: datetime,
+        day_end: datetime,
+        *,
+        before_id: int | None = None,
+        limit: int | None = None,
+    ) -> list[TaskRecord]:
+        """Открытые задачи команды за день, id DESC; пагинация как у list_by_owner."""
+        stmt = (
+            TaskReadRepository._select()
+            .where(
+                Task.team_id == team_id,
+                Task.due_at >= day_start,
+                Task.due_at < day_end,
+                Task.status == "todo",
+            )
+            .order_by(Task.id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            stmt = stmt.where(Task.id < before_id)
+        return await TaskReadRepository._records(db, stmt)
+
+    @staticmethod
+    async def _split_today(
+        db: AsyncSession, *where, order_by
+    ) -> tuple[list[TaskRecord], list[TaskRecord]]:
+        records = await TaskReadRepository._records(
+            db,
+            TaskReadRepository._select()
+            .where(*where, Task.status.in_(("todo", "done")))
+            .order_by(order_by),
+        )
+
+        open_tasks: list[TaskRecord] = []
+        done_tasks: list[TaskRecord] = []
+        for task in records:
+            (done_tasks if task.status == "done" else open_tasks).append(task)
+        return open_tasks, done_tasks
+
+    @staticmethod
+    async def list_today_split_by_owner(
+        db: AsyncSession, owner_user_id: int, day_start: datetime, day_end: datetime
+    ) -> tuple[list[TaskRecord], list[TaskRecord]]:
+        """
+        Личные задачи за [day_start, day_end) одним запросом: (open, done).
+        Порядок как у list_today_open/done_by_owner — по due_at ASC.
+        """
+        return await TaskReadRepository._split_today(
+            db,
+            Task.owner_user_id == owner_user_id,
+            Task.team_id.is_(None),
+            Task.due_at >= day_start,
+            Task.due_at < day_end,
+            order_by=Task.due_at.asc(),
+        )
+
+    @staticmethod
+    async def list_today_split_by_team(
+        db: AsyncSession, team_id: int, day_start: datetime, day_end: datetime
+    ) -> tuple[list[TaskRecord], list[TaskRecord]]:
+        """
+        Командные задачи за [day_start, day_end) одним запросом: (open, done).
+        Порядок как у list_today_open/done_by_team — по id DESC.
+        """
+        return await TaskReadRepository._split_today(
+            db,
+            Task.team_id == team_id,
+            Task.due_at >= day_start,
+            Task.due_at < day_end,
+            order_by=Task.id.desc(),
+        )
@@ -1,14 +1,25 @@
 import os
 
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import select, func
+from sqlalchemy import and_, case, or_, insert, literal, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.task import Task
 from app.models.team_member import TeamMember
-
+from app.models.user import User
+from app.db.dialect import plus_days
+
+from app.repository.scope_versions import ScopeVersionRepository
+from app.repository.task_counters import (
+    SCOPE_USER,
+    CounterDeltas,
+    TaskCounterRepository,
+    task_scope,
+)
+from app.repository.team_stats import StatDeltas, TeamStatsRepository
 from app.repository.users import UserRepository
 
 
@@ -35,10 +46,28 @@ class TaskRepository:
             created_by=created_by,
         )
         db.add(task)
+        await TaskCounterRepository.apply(
+            db, CounterDeltas({(SCOPE_USER, owner_user_id, "todo"): 1})
+        )
+        await ScopeVersionRepository.bump(db, [(SCOPE_USER, owner_user_id)])
         await db.commit()
         await db.refresh(task)
         return task
 
+    @staticmethod
+    def _due_at_from_hhmm(remind_at: str) -> datetime:
+        """"HH:MM" -> ближайшее такое время (сегодня или завтра), naive в APP_TZ."""
+        hh, mm = map(int, remind_at.split(":"))
+
+        now = datetime.now(APP_TZ).replace(tzinfo=None)  # naive "по Москве"
+        due_at = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+
+        if due_at <= now:
+            due_at += timedelta(days=1)
+
+        # на всякий случай (чтобы не словить tzinfo случайно)
+        return due_at.replace(tzinfo=None)
+
     @staticmethod
     async def create_from_bot(
         db: AsyncSession,
@@ -50,83 +79,128 @@ class TaskRepository:
         username: str | None,
         first_name: str | None,
     ) -> Task:
-        # 1) user upsert by telegram_id
+        # 1) user upsert by telegram_id — в той же транзакции, что и задача
         user = await UserRepository.upsert(
             db,
             telegram_id=telegram_id,
             username=username,
             first_name=first_name,
+            commit=False,
         )
 
         # 2) "HH:MM" -> datetime (today) in APP_TZ, BUT store naive (no tzinfo)
-        hh, mm = map(int, remind_at.split(":"))
+        due_at = TaskRepository._due_at_from_hhmm(remind_at)
 
-        now = datetime.now(APP_TZ).replace(tzinfo=None)  # naive "по Москве"
-        due_at = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
-
-        if due_at <= now:
-            due_at += timedelta(days=1)
-
-        # на всякий случай (чтобы не словить tzinfo случайно)
-        due_at = due_at.replace(tzinfo=None)
-
-        # 3) create task
-        task = Task(
-            title=title,
-            description=description,
-            due_at=due_at,
-            status="todo",
-            owner_user_id=user.id,
-            created_by=user.id,
-            team_id=user.active_team_id,
+        # 3) create task: INSERT ... RETURNING вместо add + refresh,
+        # upsert и задача — один commit
+        res = await db.execute(
+            insert(Task)
+            .values(
+                title=title,
+                description=description,
+                due_at=due_at,
+                status="todo",
+                owner_user_id=user.id,
+                created_by=user.id,
+                team_id=user.active_team_id,
+            )
+            .returning(Task)
         )
-        db.add(task)
+        task = res.scalar_one()
+        await TaskCounterRepository.apply(
+            db, CounterDeltas({(*task_scope(task), "todo"): 1})
+        )
+        await ScopeVersionRepository.bump(db, [task_scope(task)])
         await db.commit()
-        await db.refresh(task)
+        UserRepository.invalidate(telegram_id)
         return task
 
     @staticmethod
-    async def list_by_owner(db: AsyncSession, owner_user_id: int) -> list[Task]:
-        res = await db.execute(
-            select(Task)
-            .where(
-                Task.owner_user_id == owner_user_id,
-                Task.team_id.is_(None),
-            )
-            .order_by(Task.id.desc())
-        )
-        return list(res.scalars().all())
+    async def create_many_from_bot(
+        db: AsyncSession,
+        *,
+        telegram_id: int,
+        username: str | None,
+        first_name: str | None,
+        items: list[dict],
+    ) -> list[Task]:
+        """
+        Пачка задач из бота: upsert пользователя + один INSERT на все задачи
+        (executemany с RETURNING), один commit.
 
-    @staticmethod
-    async def count_by_owner(db: AsyncSession, owner_user_id: int) -> int:
-        res = await db.execute(
-            select(func.count(Task.id)).where(
-                Task.owner_user_id == owner_user_id,
-                Task.team_id.is_(None),
-            )
+        items: [{"title", "description", "remind_at"}], remind_at уже "HH:MM".
+        """
+        user = await UserRepository.upsert(
+            db,
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            commit=False,
+        )
+        rows = [
+            {
+                "title": item["title"],
+                "description": item.get("description"),
+                "due_at": TaskRepository._due_at_from_hhmm(item["remind_at"]),
+                "status": "todo",
+                "owner_user_id": user.id,
+                "created_by": user.id,
+                "team_id": user.active_team_id,
+            }
+            for item in items
+        ]
+        res = await db.scalars(
+            insert(Task).returning(Task, sort_by_parameter_order=True), rows
+        )
+        tasks = list(res.all())
+        await TaskCounterRepository.apply(
+            db, CounterDeltas((*task_scope(t), t.status) for t in tasks)
         )
-        return int(res.scalar_one())
+        await ScopeVersionRepository.bump(db, map(task_scope, tasks))
+        await db.commit()
+        UserRepository.invalidate(telegram_id)
+        return tasks
 
     @staticmethod
-    async def list_today_by_owner(
+    async def stream_export(
         db: AsyncSession,
-        owner_user_id: int,
-        day_start: datetime,
-        day_end: datetime,
-    ) -> list[Task]:
-        """Return owner's tasks due within [day_start, day_end), ordered by due_at."""
-        res = await db.execute(
-            select(Task)
-            .where(
-                Task.owner_user_id == owner_user_id,
-                Task.team_id.is_(None),
-                Task.due_at.is_not(None),
-                Task.due_at >= day_start,
-                Task.due_at < day_end,
+        *,
+        owner_user_id: int | None = None,
+        team_id: int | None = None,
+        chunk_size: int = 500,
+    ) -> AsyncIterator[list]:
+        """
+        Вся история задач владельца (личные) или команды — пачками строк.
+
+        Серверный курсор (db.stream + yield_per): в памяти одновременно
+        не больше chunk_size строк, сколько бы задач ни было.
+        Колонки — в порядке app.core.export.EXPORT_FIELDS.
+        """
+        stmt = (
+            select(
+                Task.id,
+                Task.title,
+                Task.description,
+                Task.due_at,
+                Task.status,
+                Task.team_id,
+                Task.created_by,
+                TeamMember.nickname,
             )
-            .order_by(Task.due_at.asc())
+            .outerjoin(TeamMember, TeamMember.id == Task.done_by_member_id)
+            .order_by(Task.id.asc())
+            .execution_options(yield_per=chunk_size)
         )
-        return list(res.scalars().all())
+        if team_id is not None:
+            stmt = stmt.where(Task.team_id == team_id)
+        else:
+            stmt = stmt.where(
+                Task.owner_user_id == owner_user_id, Task.team_id.is_(None)
+            )
+
+        res = await db.stream(stmt)
+        async for rows in res.partitions():
+            yield rows
 
     @staticmethod
     async def get_personal_by_id(
@@ -165,81 +239,235 @@ class TaskRepository:
         )
         return res.scalar_one_or_none()
 
+    # новое due_at -> напоминание должно сработать ещё раз
+    _REMINDER_RESET = {
+        "reminded_at": None,
+        "remind_lease_until": None,
+        "remind_lease_owner": None,
+    }
+
     @staticmethod
-    async def get_team_by_id(
-        db: AsyncSession,
-        *,
-        task_id: int,
-        team_id: int,
-    ) -> Task | None:
+    async def _update_returning(db: AsyncSession, stmt) -> list:
+        # populate_existing: Task мог уже лежать в identity map сессии
+        res = await db.execute(
+            stmt, execution_options={"populate_existing": True}
+        )
+        return sorted(res.all(), key=lambda row: row[0].id)
+
+    @staticmethod
+    async def _commit_done(db: AsyncSession, tasks: list[Task]) -> None:
+        # все строки прошли todo -> done (UPDATE фильтрует status = 'todo'),
+        # счётчики и дневная статистика команды — в той же транзакции
+        deltas = CounterDeltas()
+        stats = StatDeltas()
+        for task in tasks:
+            scope, scope_id = task_scope(task)
+            deltas[(scope, scope_id, "todo")] -= 1
+            deltas[(scope, scope_id, "done")] += 1
+            if task.team_id is not None and task.done_by_member_id is not None:
+                stats[(task.team_id, task.done_by_member_id, task.done_at.date())] += 1
+        await TaskCounterRepository.apply(db, deltas)
+        await TeamStatsRepository.apply(db, stats)
+        await ScopeVersionRepository.bump(db, map(task_scope, tasks))
+        await db.commit()
+
+    @staticmethod
+    def _now_local() -> datetime:
+        # naive "по APP_TZ", как due_at
+        return datetime.now(APP_TZ).replace(tzinfo=None)
+
+    @staticmethod
+    def _member_id(team_id: int, user_id: int):
+        return (
+            select(TeamMember.id)
+            .where(TeamMember.team_id == team_id, TeamMember.user_id == user_id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    async def _team_rows(db: AsyncSession, rows: list) -> list[Task]:
+        # member_id одинаковый во всех строках: это подзапрос по пользователю
+        if rows and rows[0].member_id is None:
+            await db.rollback()
+            raise PermissionError("Not a team member")
+        return [row[0] for row in rows]
+
+    @staticmethod
+    async def _team_miss(
+        db: AsyncSession, *, task_ids: list[int], team_id: int, user_id: int
+    ) -> list[Task]:
         """
-        Получить **командную** задачу по её ID, но **только если она принадлежит** указанному команде.
+        UPDATE не задел ни одной строки, и RETURNING не сказал, участник ли
+        пользователь. Один SELECT от строки-якоря отвечает на оба вопроса:
+        member_id (не участник -> PermissionError) и какие задачи из task_ids
+        вообще есть в команде (например, уже закрытые).
         """
+        member_id = TaskRepository._member_id(team_id, user_id)
+        anchor = select(literal(1).label("one")).subquery()
         res = await db.execute(
-            select(Task).where(
-                Task.id == task_id,
+            select(member_id.label("member_id"), Task)
+            .select_from(anchor)
+            .outerjoin(Task, and_(Task.id.in_(task_ids), Task.team_id == team_id))
+        )
+        rows = res.all()
+        if rows[0].member_id is None:
+            raise PermissionError("Not a team member")
+        return [row[1] for row in rows if row[1] is not None]
+
+    @staticmethod
+    async def _mark_done_team(
+        db: AsyncSession, *, task_ids: list[int], team_id: int, user_id: int
+    ) -> tuple[list[Task], list[Task]]:
+        """(закрытые этим вызовом, существующие, но не тронутые)."""
+        member_id = TaskRepository._member_id(team_id, user_id)
+        is_member = member_id.is_not(None)
+        rows = await TaskRepository._update_returning(
+            db,
+            update(Task)
+            .where(
+                Task.id.in_(task_ids),
                 Task.team_id == team_id,
+                Task.status == "todo",
             )
+            .values(
+                status=case((is_member, "done"), else_=Task.status),
+                done_by_member_id=func.coalesce(member_id, Task.done_by_member_id),
+                done_at=case(
+                    (is_member, TaskRepository._now_local()), else_=Task.done_at
+                ),
+            )
+            .returning(Task, member_id.label("member_id")),
         )
-        return res.scalar_one_or_none()
+        if not rows:
+            return [], await TaskRepository._team_miss(
+                db, task_ids=task_ids, team_id=team_id, user_id=user_id
+            )
+        tasks = await TaskRepository._team_rows(db, rows)
+        await TaskRepository._commit_done(db, tasks)
+        return tasks, []
 
-    # TODO: open/done
     @staticmethod
-    async def list_today_open_by_owner(db, owner_user_id: int, day_start, day_end):
+    async def mark_done_personal_many(
+        db: AsyncSession, *, task_ids: list[int], owner_user_id: int
+    ) -> list[Task]:
         """
-        Возвращает выполненные задачи ("done") владельца за сегодня.
-        Фильтр по due_at: [day_start, day_end), сортировка по due_at ASC.
+        Отметить выполненными личные задачи из task_ids одним UPDATE.
+        Возвращает только те, что были открыты (и теперь закрыты).
         """
-        stmt = (
-            select(Task)
+        rows = await TaskRepository._update_returning(
+            db,
+            update(Task)
             .where(
+                Task.id.in_(task_ids),
                 Task.owner_user_id == owner_user_id,
-                Task.due_at >= day_start,
-                Task.due_at < day_end,
-                Task.status == "todo",
                 Task.team_id.is_(None),
+                Task.status == "todo",
             )
-            .order_by(Task.due_at.asc())
+            .values(status="done", done_at=TaskRepository._now_local())
+            .returning(Task),
         )
-        res = await db.execute(stmt)
-        return res.scalars().all()
+        tasks = [row[0] for row in rows]
+        await TaskRepository._commit_done(db, tasks)
+        return tasks
 
     @staticmethod
-    async def list_today_done_by_owner(db, owner_user_id: int, day_start, day_end):
-        """
-        Возвращает выполненные задачи ("done") владельца за сегодня.
-        Фильтр по due_at: [day_start, day_end), сортировка по due_at ASC.
-        """
-        stmt = (
-            select(Task)
+    async def snooze_to_tomorrow_personal_many(
+        db: AsyncSession, *, task_ids: list[int], owner_user_id: int
+    ) -> list[Task]:
+        """Перенести личные задачи из task_ids на завтра одним UPDATE."""
+        rows = await TaskRepository._update_returning(
+            db,
+            update(Task)
             .where(
+                Task.id.in_(task_ids),
                 Task.owner_user_id == owner_user_id,
-                Task.due_at >= day_start,
-                Task.due_at < day_end,
-                Task.status == "done",
                 Task.team_id.is_(None),
             )
-            .order_by(Task.due_at.asc())
+            .values(
+                due_at=plus_days(db, Task.due_at, 1),
+                **TaskRepository._REMINDER_RESET,
+            )
+            .returning(Task),
         )
-        res = await db.execute(stmt)
-        return res.scalars().all()
+        tasks = [row[0] for row in rows]
+        await ScopeVersionRepository.bump(db, map(task_scope, tasks))
+        await db.commit()
+        return tasks
+
+    @staticmethod
+    async def mark_done_team_many(
+        db: AsyncSession,
+        *,
+        task_ids: list[int],
+        team_id: int,
+        user_id: int,
+    ) -> list[Task]:
+        """
+        Отметить открытые командные задачи выполненными одним UPDATE ... RETURNING.
+
+        Участник ищется подзапросом в том же UPDATE. Если пользователь не
+        участник — строки не меняются (CASE оставляет старые значения),
+        а RETURNING отдаёт member_id = NULL -> PermissionError.
+        Если UPDATE не задел ни одной строки, участие проверяет _team_miss,
+        так что не участник получает PermissionError и на пустом пакете.
+        Уже закрытые задачи не трогаем: done_by остаётся за тем, кто успел первым.
+
+        Задачи не из этой команды просто не попадают в результат.
+        """
+        tasks, _ = await TaskRepository._mark_done_team(
+            db, task_ids=task_ids, team_id=team_id, user_id=user_id
+        )
+        return tasks
+
+    @staticmethod
+    async def snooze_to_tomorrow_team_many(
+        db: AsyncSession,
+        *,
+        task_ids: list[int],
+        team_id: int,
+        user_id: int,
+    ) -> list[Task]:
+        """Как mark_done_team_many (с проверкой участия), но due_at + 1 день."""
+        member_id = TaskRepository._member_id(team_id, user_id)
+        is_member = member_id.is_not(None)
+        rows = await TaskRepository._update_returning(
+            db,
+            update(Task)
+            .where(Task.id.in_(task_ids), Task.team_id == team_id)
+            .values(
+                due_at=case(
+                    (is_member, plus_days(db, Task.due_at, 1)), else_=Task.due_at
+                ),
+                **{
+                    column: case((is_member, value), else_=getattr(Task, column))
+                    for column, value in TaskRepository._REMINDER_RESET.items()
+                },
+            )
+            .returning(Task, member_id.label("member_id")),
+        )
+        if not rows:
+            await TaskRepository._team_miss(
+                db, task_ids=task_ids, team_id=team_id, user_id=user_id
+            )
+            return []
+        tasks = await TaskRepository._team_rows(db, rows)
+        await ScopeVersionRepository.bump(db, map(task_scope, tasks))
+        await db.commit()
+        return tasks
 
     @staticmethod
     async def mark_done_personal(
         db, *, task_id: int, owner_user_id: int
     ) -> Task | None:
-        task = await TaskRepository.get_personal_by_id(
-            db,
-            task_id=task_id,
-            owner_user_id=owner_user_id,
+        tasks = await TaskRepository.mark_done_personal_many(
+            db, task_ids=[task_id], owner_user_id=owner_user_id
+        )
+        if tasks:
+            return tasks[0]
+        # ничего не поменялось: задачи нет или она уже выполнена
+        return await TaskRepository.get_personal_by_id(
+            db, task_id=task_id, owner_user_id=owner_user_id
         )
-        if task is None:
-            return None
-
-        task.status = "done"
-        await db.commit()
-        await db.refresh(task)
-        return task
 
     @staticmethod
     async def snooze_to_tomorrow_personal(
@@ -248,19 +476,10 @@ class TaskRepository:
         task_id: int,
         owner_user_id: int,
     ):
-        task = await TaskRepository.get_personal_by_id(
-            db,
-            task_id=task_id,
-            owner_user_id=owner_user_id,
+        tasks = await TaskRepository.snooze_to_tomorrow_personal_many(
+            db, task_ids=[task_id], owner_user_id=owner_user_id
         )
-        if task is None:
-            return None
-
-        task.due_at = task.due_at + timedelta(days=1)
-
-        await db.commit()
-        await db.refresh(task)
-        return task
+        return tasks[0] if tasks else None
 
     @staticmethod
     async def mark_done_team(
@@ -270,27 +489,19 @@ class TaskRepository:
         team_id: int,
         user_id: int,
     ) -> Task | None:
-        task = await TaskRepository.get_team_by_id(db, task_id=task_id, team_id=team_id)
-        if task is None:
-            return None
+        """
+        Returns:
+            `Task` или `None`, если задачи нет в команде.
 
-        # найти участника команды (чтобы взять его nickname)
-        res = await db.execute(
-            select(TeamMember).where(
-                TeamMember.team_id == team_id,
-                TeamMember.user_id == user_id,
-            )
+        Raises:
+            PermissionError: пользователь не участник команды.
+        """
+        done, untouched = await TaskRepository._mark_done_team(
+            db, task_ids=[task_id], team_id=team_id, user_id=user_id
         )
-        member = res.scalar_one_or_none()
-        if member is None:
-            return None  # человек не участник команды
-
-        task.status = "done"
-        task.done_by_member_id = member.id
-
-        await db.commit()
-        await db.refresh(task)
-        return task
+        # ничего не поменялось: задачи нет или её уже кто-то закрыл
+        tasks = done or untouched
+        return tasks[0] if tasks else None
 
     @staticmethod
     async def snooze_to_tomorrow_team(
@@ -298,44 +509,145 @@ class TaskRepository:
         *,
         task_id: int,
         team_id: int,
+        user_id: int,
     ) -> Task | None:
-        task = await TaskRepository.get_team_by_id(db, task_id=task_id, team_id=team_id)
-        if task is None:
-            return None
+        tasks = await TaskRepository.snooze_to_tomorrow_team_many(
+            db, task_ids=[task_id], team_id=team_id, user_id=user_id
+        )
+        return tasks[0] if tasks else None
 
-        task.due_at = task.due_at + timedelta(days=1)
-        await db.commit()
-        await db.refresh(task)
-        return task
+    @staticmethod
+    async def list_due_window(
+        db: AsyncSession,
+        *,
+        since: datetime,
+        until: datetime,
+        after: tuple[datetime, int] | None = None,
+        limit: int = 500,
+    ):
+        """
+        Открытые задачи с due_at в [since, until) для планировщика напоминаний.
+
+        Идёт по частичному индексу ix_tasks_remind_pending, поэтому после
+        рестарта бот поднимает только своё окно, а не всю таблицу tasks.
+        Пагинация keyset-ом по (due_at, id): `after` — последняя пара
+        из предыдущей страницы.
+        """
+        stmt = (
+            select(
+                Task.id,
+                Task.title,
+                Task.due_at,
+                Task.team_id,
+                User.telegram_id,
+            )
+            .join(User, User.id == Task.owner_user_id)
+            .where(
+                Task.status == "todo",
+                Task.reminded_at.is_(None),
+                Task.due_at >= since,
+                Task.due_at < until,
+            )
+            .order_by(Task.due_at.asc(), Task.id.asc())
+            .limit(limit)
+        )
+        if after is not None:
+            after_due_at, after_id = after
+            stmt = stmt.where(
+                or_(
+                    Task.due_at > after_due_at,
+                    and_(Task.due_at == after_due_at, Task.id > after_id),
+                )
+            )
+
+        res = await db.execute(stmt)
+        return list(res.all())
 
     @staticmethod
-    async def list_today_open_by_team(
-        db: AsyncSession, team_id: int, day_start: datetime, day_end: datetime
-    ) -> list[Task]:
-        res = await db.execute(
-            select(Task)
+    async def claim_due_reminders(
+        db: AsyncSession,
+        *,
+        worker_id: str,
+        now: datetime,
+        lease: timedelta,
+        limit: int = 100,
+    ):
+        """
+        Забрать пачку наступивших напоминаний в аренду (lease) воркеру.
+
+        - строки выбираются `FOR UPDATE SKIP LOCKED`, поэтому параллельные
+          воркеры получают непересекающиеся пачки и не ждут друг друга;
+        - аренда истекает через `lease`: если воркер упал, не подтвердив
+          отправку, задачу заберёт кто-то другой.
+
+        Подтверждение отправки — `ack_reminders`.
+        """
+        stmt = (
+            select(
+                Task.id,
+                Task.title,
+                Task.due_at,
+                Task.team_id,
+                User.telegram_id,
+            )
+            .join(User, User.id == Task.owner_user_id)
             .where(
-                Task.team_id == team_id,
-                Task.due_at >= day_start,
-                Task.due_at < day_end,
                 Task.status == "todo",
+                Task.reminded_at.is_(None),
+                Task.due_at <= now,
+                or_(
+                    Task.remind_lease_until.is_(None),
+                    Task.remind_lease_until < now,
+                ),
             )
-            .order_by(Task.id.desc())
+            .order_by(Task.due_at.asc(), Task.id.asc())
+            .limit(limit)
+            .with_for_update(of=Task, skip_locked=True)
+        )
+        rows = list((await db.execute(stmt)).all())
+        if not rows:
+            await db.rollback()
+            return []
+
+        await db.execute(
+            update(Task)
+            .where(Task.id.in_([r.id for r in rows]))
+            .values(remind_lease_until=now + lease, remind_lease_owner=worker_id)
         )
-        return list(res.scalars().all())
+        await db.commit()
+        return rows
 
     @staticmethod
-    async def list_today_done_by_team(
-        db: AsyncSession, team_id: int, day_start: datetime, day_end: datetime
-    ) -> list[Task]:
+    async def ack_reminders(
+        db: AsyncSession,
+        *,
+        task_ids: list[int],
+        now: datetime,
+        worker_id: str | None = None,
+    ) -> int:
+        """
+        Отметить напоминания отправленными (reminded_at = now).
+
+        С `worker_id` подтверждаются только задачи, аренда которых всё ещё
+        у этого воркера. Без него (локальный планировщик без аренды) —
+        любые ещё не отправленные.
+        """
+        if not task_ids:
+            return 0
+
+        stmt = update(Task).where(
+            Task.id.in_(task_ids),
+            Task.reminded_at.is_(None),
+        )
+        if worker_id is not None:
+            stmt = stmt.where(Task.remind_lease_owner == worker_id)
+
         res = await db.execute(
-            select(Task)
-            .where(
-                Task.team_id == team_id,
-                Task.due_at >= day_start,
-                Task.due_at < day_end,
-                Task.status == "done",
+            stmt.values(
+                reminded_at=now,
+                remind_lease_until=None,
+                remind_lease_owner=None,
             )
-            .order_by(Task.id.desc())
         )
-        return list(res.scalars().all())
+        await db.commit()
+        return res.rowcount
@@ -0,0 +1,131 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.dialect import upsert_insert
+from app.models.task import Task
+from app.models.team_daily_stat import TeamDailyStat
+from app.models.team_member import TeamMember
+
+
+# (team_id, member_id, day) -> сколько задач закрыто
+StatDeltas = Counter[tuple[int, int, date]]
+
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+
+
+def period_start(day: date, period: str) -> date:
+    """Начало бакета: сам день или понедельник его недели."""
+    if period == PERIOD_WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class TeamStatsRepository:
+    @staticmethod
+    async def apply(db: AsyncSession, deltas: StatDeltas) -> None:
+        """
+        Добавить закрытые задачи в дневной агрегат одним upsert.
+
+        Не коммитит — как TaskCounterRepository.apply, вызывается в транзакции,
+        которая закрывает задачи.
+        """
+        rows = [
+            {"team_id": team_id, "member_id": member_id, "day": day, "done_count": n}
+            for (team_id, member_id, day), n in sorted(deltas.items())
+            if n
+        ]
+        if not rows:
+            return
+
+        table = TeamDailyStat.__table__
+        stmt = upsert_insert(db, table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.team_id, table.c.member_id, table.c.day],
+            set_={"done_count": table.c.done_count + stmt.excluded.done_count},
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def list_by_team(
+        db: AsyncSession,
+        *,
+        team_id: int,
+        since: date,
+        until: date,
+        period: str = PERIOD_DAY,
+    ) -> list[dict]:
+        """
+        Закрытые задачи по участникам за [since, until), по дням или неделям.
+
+        Читает только team_daily_stats (строк максимум участники × дни),
+        недели складываются уже в Python.
+        """
+        res = await db.execute(
+            select(
+                TeamDailyStat.day,
+                TeamDailyStat.member_id,
+                TeamMember.nickname,
+                TeamDailyStat.done_count,
+            )
+            .join(TeamMember, TeamMember.id == TeamDailyStat.member_id)
+            .where(
+                TeamDailyStat.team_id == team_id,
+                TeamDailyStat.day >= since,
+                TeamDailyStat.day < until,
+            )
+        )
+
+        buckets: dict[tuple[date, int], int] = defaultdict(int)
+        nicknames: dict[int, str] = {}
+        for day, member_id, nickname, done_count in res.all():
+            buckets[(period_start(day, period), member_id)] += done_count
+            nicknames[member_id] = nickname
+
+        return [
+            {
+                "period_start": start,
+                "member_id": member_id,
+                "nickname": nicknames[member_id],
+                "done_count": done_count,
+            }
+            for (start, member_id), done_count in sorted(
+                buckets.items(), key=lambda item: (item[0][0], -item[1], item[0][1])
+            )
+        ]
+
+    @staticmethod
+    async def rebuild(db: AsyncSession) -> int:
+        """
+        Пересчитать team_daily_stats из tasks (done_at + done_by_member_id).
+
+        Задачи, закрытые до появления done_at (done_at IS NULL), не учитываются.
+        Блокировка — как в TaskCounterRepository.rebuild.
+        """
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("LOCK TABLE team_daily_stats IN EXCLUSIVE MODE"))
+
+        # func.date, а не CAST(... AS DATE): в SQLite CAST отдаёт только год
+        day = func.date(Task.done_at)
+        source = (
+            select(Task.team_id, Task.done_by_member_id, day, func.count())
+            .where(
+                Task.team_id.is_not(None),
+                Task.status == "done",
+                Task.done_by_member_id.is_not(None),
+                Task.done_at.is_not(None),
+            )
+            .group_by(Task.team_id, Task.done_by_member_id, day)
+        )
+
+        await db.execute(delete(TeamDailyStat))
+        res = await db.execute(
+            insert(TeamDailyStat).from_select(
+                ["team_id", "member_id", "day", "done_count"], source
+            )
+        )
+        await db.commit()
+        return res.rowcount
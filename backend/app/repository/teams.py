@@ -3,11 +3,11 @@ from __future__ import annotations
 import secrets
 import string
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.dialects.postgresql import insert
 
+from app.db.dialect import upsert_insert
 from app.models.team import Team
 from app.models.team_member import TeamMember
 from app.models.user import User
@@ -26,6 +26,10 @@ class TeamRepository:
     async def create_team_with_creator(
         self, *, name: str, user_id: int, nickname: str
     ) -> Team:
+        """
+        Команда + создатель-участник + активная команда создателя —
+        одна транзакция. Кэш identity сбрасывает вызывающий (по telegram_id).
+        """
         if not user_id:
             # это лучше ловить раньше, чем получать 500 из БД
             raise ValueError("user_id is required")
@@ -48,6 +52,11 @@ class TeamRepository:
                 await self.session.flush()  # получаем team.id, может упасть из-за UNIQUE
                 member = TeamMember(team_id=team.id, user_id=user_id, nickname=nickname)
                 self.session.add(member)
+                await self.session.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(active_team_id=team.id)
+                )
 
                 await self.session.commit()
                 await self.session.refresh(team)
@@ -131,6 +140,7 @@ class TeamRepository:
         team_id: int,
         user_id: int,
         nickname: str,
+        commit: bool = True,
     ) -> TeamMember | None:
         """
         Гарантирует, что участник есть в team_members.
@@ -138,10 +148,11 @@ class TeamRepository:
         - безопасно при гонках
         - если уже есть: ничего не делает
         - если ник занят в команде: кидает IntegrityError (поймаешь в роутере -> 409)
+        - commit=False: вставка остаётся в транзакции вызывающего
         """
 
         stmt = (
-            insert(TeamMember)
+            upsert_insert(db, TeamMember)
             .values(team_id=team_id, user_id=user_id, nickname=nickname)
             # конфликт по (team_id, user_id) -> просто ничего не делаем
             .on_conflict_do_nothing(index_elements=["team_id", "user_id"])
@@ -151,7 +162,8 @@ class TeamRepository:
         try:
             res = await db.execute(stmt)
             new_id = res.scalar_one_or_none()
-            await db.commit()
+            if commit:
+                await db.commit()
         except IntegrityError:
             await db.rollback()
             raise
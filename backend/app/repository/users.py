@@ -1,33 +1,141 @@
-from sqlalchemy import select
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import TTLCache
+from app.db.dialect import upsert_insert
 from app.models.user import User
 
 
+# telegram_id -> UserIdentity. Сбрасывается всеми методами, которые меняют
+# пользователя; между процессами backend расхождение живёт не дольше TTL.
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "30"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+
+_identity_cache = TTLCache(maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL)
+
+
+@dataclass(frozen=True, slots=True)
+class UserIdentity:
+    """Лёгкий снимок пользователя: всё, что нужно роутам для авторизации."""
+
+    id: int
+    telegram_id: int
+    username: str | None
+    first_name: str | None
+    active_team_id: int | None
+
+
 class UserRepository:
     @staticmethod
     async def get_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
         res = await db.execute(select(User).where(User.telegram_id == telegram_id))
         return res.scalar_one_or_none()
 
+    @staticmethod
+    async def get_identity(db: AsyncSession, telegram_id: int) -> UserIdentity | None:
+        """
+        telegram_id -> (users.id, active_team_id, ...) через in-process кэш.
+
+        Отсутствующих пользователей не кэшируем: бот делает /users/upsert,
+        и следующий запрос должен его увидеть.
+        """
+        identity = _identity_cache.get(telegram_id)
+        if identity is not None:
+            return identity
+
+        res = await db.execute(
+            select(
+                User.id,
+                User.telegram_id,
+                User.username,
+                User.first_name,
+                User.active_team_id,
+            ).where(User.telegram_id == telegram_id)
+        )
+        row = res.one_or_none()
+        if row is None:
+            return None
+
+        identity = UserIdentity(*row)
+        _identity_cache.set(telegram_id, identity)
+        return identity
+
+    @staticmethod
+    def invalidate(telegram_id: int) -> None:
+        _identity_cache.pop(telegram_id)
+
+    @staticmethod
+    def clear_identity_cache() -> None:
+        _identity_cache.clear()
+
+    @staticmethod
+    async def set_active_team(
+        db: AsyncSession, *, telegram_id: int, team_id: int | None
+    ) -> bool:
+        """
+        Сменить (или сбросить, team_id=None) активную команду пользователя.
+
+        Один UPDATE по telegram_id и commit; False — такого пользователя нет.
+        """
+        res = await db.execute(
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(active_team_id=team_id)
+        )
+        await db.commit()
+        UserRepository.invalidate(telegram_id)
+        return res.rowcount > 0
+
     @staticmethod
     async def upsert(
         db: AsyncSession,
         telegram_id: int,
         username: str | None,
         first_name: str | None,
+        *,
+        commit: bool = True,
     ) -> User:
-        user = await UserRepository.get_by_telegram_id(db, telegram_id)
+        """
+        Создать или обновить пользователя одним запросом:
+        INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... WHERE ... RETURNING.
 
+        Параллельные /start с одним telegram_id не падают на UNIQUE.
+        Если профиль не изменился, WHERE отсекает UPDATE (ни записи, ни
+        новой версии строки) и RETURNING пуст — тогда читаем строку SELECT'ом.
+        commit=False — upsert становится частью транзакции вызывающего,
+        тогда commit и invalidate(telegram_id) делает он.
+        """
+        stmt = upsert_insert(db, User).values(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": stmt.excluded.username,
+                "first_name": stmt.excluded.first_name,
+            },
+            where=or_(
+                User.username.is_distinct_from(stmt.excluded.username),
+                User.first_name.is_distinct_from(stmt.excluded.first_name),
+            ),
+        ).returning(User)
+
+        # populate_existing: если User уже в identity map сессии — обновим его
+        res = await db.execute(stmt, execution_options={"populate_existing": True})
+        user = res.scalar_one_or_none()
         if user is None:
-            user = User(
-                telegram_id=telegram_id, username=username, first_name=first_name
+            # профиль тот же: писать нечего, кэш identity не устарел
+            res = await db.execute(
+                select(User).where(User.telegram_id == telegram_id)
             )
-            db.add(user)
-        else:
-            user.username = username
-            user.first_name = first_name
+            return res.scalar_one()
 
-        await db.commit()
-        await db.refresh(user)
+        if commit:
+            await db.commit()
+            UserRepository.invalidate(telegram_id)
         return user
@@ -1,18 +1,124 @@
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Literal
 from zoneinfo import ZoneInfo
 import os
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cursor import decode_cursor, encode_cursor
+from app.core.export import EXPORT_MEDIA_TYPES, encode_csv, encode_ndjson
 from app.db.database import get_db
+from app.repository.scope_versions import ScopeVersionRepository
+from app.repository.task_counters import (
+    SCOPE_TEAM,
+    SCOPE_USER,
+    TaskCounterRepository,
+)
+from app.repository.task_reads import TaskReadRepository, TaskRecord
 from app.repository.tasks import TaskRepository
 from app.repository.users import UserRepository
-from app.schemas.task import TaskCreateIn, TaskOut, TaskCreateFromBotIn, TodayTasksOut
+from app.schemas.task import (
+    DueTaskOut,
+    ReminderAckIn,
+    TaskBatchCreateFromBotIn,
+    TaskCreateIn,
+    TaskIdsIn,
+    TaskPageOut,
+    TaskOut,
+    TaskCreateFromBotIn,
+    TodayTasksOut,
+)
 
 router = APIRouter(prefix="/tasks", tags=["Задачи"])
 TZ = ZoneInfo(os.getenv("APP_TZ", "UTC"))
 
+PAGE_SIZE_MAX = 200
+
+
+async def _today_etag(db: AsyncSession, scope: str, scope_id: int, day: date) -> str:
+    # версию читаем ДО списка: если запись проскочит между ними, клиент получит
+    # свежие данные со старым тегом и просто скачает их ещё раз
+    version = await ScopeVersionRepository.get(db, scope, scope_id)
+    return f'W/"{scope}-{scope_id}-{version}-{day.isoformat()}"'
+
+
+def _not_modified(etag: str, if_none_match: str | None) -> Response | None:
+    """304 без тела, если клиент прислал актуальный тег (слабое сравнение)."""
+    if if_none_match is None:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return None
+
+
+def _today_response(
+    open_tasks: list[TaskRecord], done_tasks: list[TaskRecord], etag: str
+):
+    """
+    Today-ответ в форме TodayTasksOut из TaskRecord.
+
+    orjson сериализует их напрямую: без from_attributes-валидации
+    и обращений к relationship на каждую задачу.
+    """
+    return ORJSONResponse(
+        {"open": open_tasks, "done": done_tasks}, headers={"ETag": etag}
+    )
+
+
+def _cursor_before_id(after: str | None) -> int | None:
+    if after is None:
+        return None
+    try:
+        return int(decode_cursor(after)["id"])
+    except (ValueError, OverflowError, KeyError, TypeError) as e:
+        # {"id": 1e999} декодируется в inf, и int() падает с OverflowError
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def _page(tasks: list[TaskRecord], limit: int) -> ORJSONResponse:
+    # запрашиваем limit + 1: лишняя строка значит, что есть следующая страница
+    items = tasks[:limit]
+    next_cursor = None
+    if len(tasks) > limit:
+        next_cursor = encode_cursor({"id": items[-1].id})
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+
+def _export_response(
+    db: AsyncSession, *, fmt: str, filename: str, **scope
+) -> StreamingResponse:
+    # сессия из get_db закрывается только после отправки ответа,
+    # поэтому курсор можно читать прямо во время стриминга
+    async def body():
+        first = True
+        async for rows in TaskRepository.stream_export(db, **scope):
+            if fmt == "csv":
+                yield encode_csv(rows, header=first)
+            else:
+                yield encode_ndjson(rows)
+            first = False
+        if first and fmt == "csv":
+            yield encode_csv([], header=True)
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
 
 @router.post("/personal", response_model=TaskOut)
 async def create_personal_task(
@@ -20,7 +126,7 @@ async def create_personal_task(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,10 +146,11 @@ async def create_personal_task(
 @router.get("/personal/today", response_model=TodayTasksOut)
 async def list_personal_today(
     telegram_id: int = Query(gt=0),
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
     """Возвращает задачи на сегодня для пользователя по telegram_id (open/done)."""
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         return {"open": [], "done": []}
 
@@ -51,23 +158,92 @@ async def list_personal_today(
     day_start = datetime.combine(now_local.date(), time.min)
     day_end = day_start + timedelta(days=1)
 
-    open_tasks = await TaskRepository.list_today_open_by_owner(
+    etag = await _today_etag(db, SCOPE_USER, user.id, day_start.date())
+    not_modified = _not_modified(etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
+
+    open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_owner(
         db, user.id, day_start, day_end
     )
-    done_tasks = await TaskRepository.list_today_done_by_owner(
-        db, user.id, day_start, day_end
+
+    return _today_response(open_tasks, done_tasks, etag)
+
+
+@router.get("/personal", response_model=TaskPageOut)
+async def list_personal_tasks(
+    telegram_id: int = Query(gt=0),
+    after: str | None = None,
+    limit: int = Query(50, ge=1, le=PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_db),
+):
+    """Все личные задачи пользователя постранично, новые сверху."""
+    before_id = _cursor_before_id(after)
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        return {"items": [], "next_cursor": None}
+
+    tasks = await TaskReadRepository.list_by_owner(
+        db, user.id, before_id=before_id, limit=limit + 1
+    )
+    return _page(tasks, limit)
+
+
+@router.get("/personal/export")
+async def export_personal_tasks(
+    telegram_id: int = Query(gt=0),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_db),
+):
+    """Выгрузка всех личных задач потоком (NDJSON или CSV)."""
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    return _export_response(
+        db, fmt=format, filename="tasks", owner_user_id=user.id
     )
 
-    return {"open": open_tasks, "done": done_tasks}
+
+@router.get("/team/export")
+async def export_team_tasks(
+    telegram_id: int = Query(gt=0),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_db),
+):
+    """Выгрузка всех задач активной команды потоком (NDJSON или CSV)."""
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    if user.active_team_id is None:
+        raise HTTPException(status_code=400, detail="No active team")
+
+    return _export_response(
+        db,
+        fmt=format,
+        filename=f"team_{user.active_team_id}_tasks",
+        team_id=user.active_team_id,
+    )
 
 
 @router.get("/team/today", response_model=TodayTasksOut)
 async def list_team_today(
     telegram_id: int = Query(gt=0),
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Возвращает задачи на сегодня для команды по telegram_id (open/done)."""
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    """
+    Возвращает задачи на сегодня для команды по telegram_id (open/done).
+
+    Без пагинации: бот рисует день целиком, а ответ кэшируется по ETag.
+    Большим командам — постраничный /team/today/open.
+    """
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         return {"open": [], "done": []}
 
@@ -78,13 +254,46 @@ async def list_team_today(
     day_start = datetime.combine(now_local.date(), time.min)
     day_end = day_start + timedelta(days=1)
 
-    open_tasks = await TaskRepository.list_today_open_by_team(
+    etag = await _today_etag(db, SCOPE_TEAM, user.active_team_id, day_start.date())
+    not_modified = _not_modified(etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
+
+    open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_team(
         db, user.active_team_id, day_start, day_end
     )
-    done_tasks = await TaskRepository.list_today_done_by_team(
-        db, user.active_team_id, day_start, day_end
+    return _today_response(open_tasks, done_tasks, etag)
+
+
+@router.get("/team/today/open", response_model=TaskPageOut)
+async def list_team_today_open(
+    telegram_id: int = Query(gt=0),
+    after: str | None = None,
+    limit: int = Query(50, ge=1, le=PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_db),
+):
+    """Открытые задачи команды на сегодня постранично (для больших команд)."""
+    before_id = _cursor_before_id(after)
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        return {"items": [], "next_cursor": None}
+
+    if user.active_team_id is None:
+        raise HTTPException(status_code=400, detail="No active team")
+
+    now_local = datetime.now(TZ).replace(tzinfo=None)
+    day_start = datetime.combine(now_local.date(), time.min)
+    day_end = day_start + timedelta(days=1)
+
+    tasks = await TaskReadRepository.list_today_open_by_team(
+        db,
+        user.active_team_id,
+        day_start,
+        day_end,
+        before_id=before_id,
+        limit=limit + 1,
     )
-    return {"open": open_tasks, "done": done_tasks}
+    return _page(tasks, limit)
 
 
 @router.get("/personal/count")
@@ -92,12 +301,13 @@ async def count_personal_tasks(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         return {"count": 0}
 
-    count = await TaskRepository.count_by_owner(db, user.id)
-    return {"count": count}
+    # поддерживаемый счётчик вместо COUNT(*) по всей истории
+    counters = await TaskCounterRepository.get(db, SCOPE_USER, user.id)
+    return {"count": sum(counters.values())}
 
 
 @router.post("", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
@@ -116,6 +326,169 @@ async def create_task_from_bot(
     )
 
 
+@router.post(
+    "/batch", response_model=list[TaskOut], status_code=status.HTTP_201_CREATED
+)
+async def create_tasks_batch_from_bot(
+    payload: TaskBatchCreateFromBotIn,
+    db: AsyncSession = Depends(get_db),
+):
+    """Создаёт пачку задач одним INSERT (порядок ответа = порядок payload.tasks)."""
+    return await TaskRepository.create_many_from_bot(
+        db,
+        telegram_id=payload.telegram_id,
+        username=payload.username,
+        first_name=payload.first_name,
+        items=[item.model_dump() for item in payload.tasks],
+    )
+
+
+@router.patch("/personal/done", response_model=list[TaskOut])
+async def mark_personal_done_batch(
+    payload: TaskIdsIn,
+    telegram_id: int = Query(gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Помечает выполненными личные задачи из task_ids; чужие/несуществующие пропускаются."""
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    return await TaskRepository.mark_done_personal_many(
+        db, task_ids=payload.task_ids, owner_user_id=user.id
+    )
+
+
+@router.patch("/personal/tomorrow", response_model=list[TaskOut])
+async def move_personal_tasks_to_tomorrow(
+    payload: TaskIdsIn,
+    telegram_id: int = Query(gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Переносит личные задачи из task_ids на завтра (due_at + 1 day)."""
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    return await TaskRepository.snooze_to_tomorrow_personal_many(
+        db, task_ids=payload.task_ids, owner_user_id=user.id
+    )
+
+
+@router.patch("/team/done", response_model=list[TaskOut])
+async def mark_team_done_batch(
+    payload: TaskIdsIn,
+    telegram_id: int = Query(gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    if user.active_team_id is None:
+        raise HTTPException(status_code=400, detail="No active team")
+
+    try:
+        return await TaskRepository.mark_done_team_many(
+            db,
+            task_ids=payload.task_ids,
+            team_id=user.active_team_id,
+            user_id=user.id,
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail="Not a team member") from e
+
+
+@router.patch("/team/tomorrow", response_model=list[TaskOut])
+async def move_team_tasks_to_tomorrow(
+    payload: TaskIdsIn,
+    telegram_id: int = Query(gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    if user.active_team_id is None:
+        raise HTTPException(status_code=400, detail="No active team")
+
+    try:
+        return await TaskRepository.snooze_to_tomorrow_team_many(
+            db,
+            task_ids=payload.task_ids,
+            team_id=user.active_team_id,
+            user_id=user.id,
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail="Not a team member") from e
+
+
+@router.get("/due", response_model=list[DueTaskOut])
+async def list_due_tasks(
+    since: datetime,
+    until: datetime,
+    after_due_at: datetime | None = None,
+    after_id: int | None = None,
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Окно задач для напоминаний: status='todo', due_at в [since, until).
+
+    since/until — naive время в APP_TZ (как хранится due_at).
+    Следующая страница: after_due_at/after_id последней задачи.
+    """
+    after = None
+    if after_due_at is not None and after_id is not None:
+        after = (after_due_at, after_id)
+
+    return await TaskRepository.list_due_window(
+        db, since=since, until=until, after=after, limit=limit
+    )
+
+
+@router.post("/reminders/claim", response_model=list[DueTaskOut])
+async def claim_reminders(
+    worker_id: str = Query(min_length=1, max_length=64),
+    limit: int = Query(100, ge=1, le=1000),
+    lease_sec: int = Query(60, ge=5, le=3600),
+    db: AsyncSession = Depends(get_db),
+):
+    """Берёт в аренду пачку наступивших напоминаний для воркера."""
+    now_local = datetime.now(TZ).replace(tzinfo=None)
+    return await TaskRepository.claim_due_reminders(
+        db,
+        worker_id=worker_id,
+        now=now_local,
+        lease=timedelta(seconds=lease_sec),
+        limit=limit,
+    )
+
+
+@router.post("/reminders/ack")
+async def ack_reminders(
+    payload: ReminderAckIn,
+    db: AsyncSession = Depends(get_db),
+):
+    """Подтверждает отправку напоминаний (reminded_at = now)."""
+    now_local = datetime.now(TZ).replace(tzinfo=None)
+    acked = await TaskRepository.ack_reminders(
+        db,
+        task_ids=payload.task_ids,
+        now=now_local,
+        worker_id=payload.worker_id,
+    )
+    return {"acked": acked}
+
+
 # ПОТОМ УДАЛИТЬ, НАВЕРНО
 
 # @router.get("/personal/today", response_model=list[TaskOut])
@@ -141,13 +514,13 @@ async def get_personal_task(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    task = await TaskRepository.get_personal_by_id(
+    task = await TaskReadRepository.get_personal(
         db,
         task_id=task_id,
         owner_user_id=user.id,
@@ -157,7 +530,7 @@ async def get_personal_task(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
         )
 
-    return task
+    return ORJSONResponse(task)
 
 
 @router.get("/team/{task_id}", response_model=TaskOut)
@@ -166,7 +539,7 @@ async def get_team_task(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -175,7 +548,7 @@ async def get_team_task(
     if user.active_team_id is None:
         raise HTTPException(status_code=400, detail="No active team")
 
-    task = await TaskRepository.get_team_by_id(
+    task = await TaskReadRepository.get_team(
         db,
         task_id=task_id,
         team_id=user.active_team_id,
@@ -185,7 +558,7 @@ async def get_team_task(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
         )
 
-    return task
+    return ORJSONResponse(task)
 
 
 @router.patch("/personal/{task_id}/done", response_model=TaskOut)
@@ -195,7 +568,7 @@ async def mark_personal_done(
     db: AsyncSession = Depends(get_db),
 ):
     """Помечает личную задачу выполненной (status='done')."""
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -219,7 +592,7 @@ async def move_personal_task_to_tomorrow(
     db: AsyncSession = Depends(get_db),
 ):
     """Переносит личную задачу на завтра (due_at + 1 day)."""
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -244,7 +617,7 @@ async def mark_team_done(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -253,12 +626,15 @@ async def mark_team_done(
     if user.active_team_id is None:
         raise HTTPException(status_code=400, detail="No active team")
 
-    task = await TaskRepository.mark_done_team(
-        db,
-        task_id=task_id,
-        team_id=user.active_team_id,
-        user_id=user.id,
-    )
+    try:
+        task = await TaskRepository.mark_done_team(
+            db,
+            task_id=task_id,
+            team_id=user.active_team_id,
+            user_id=user.id,
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail="Not a team member") from e
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -325,7 +701,7 @@ async def move_team_task_to_tomorrow(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -334,11 +710,15 @@ async def move_team_task_to_tomorrow(
     if user.active_team_id is None:
         raise HTTPException(status_code=400, detail="No active team")
 
-    task = await TaskRepository.snooze_to_tomorrow_team(
-        db,
-        task_id=task_id,
-        team_id=user.active_team_id,
-    )
+    try:
+        task = await TaskRepository.snooze_to_tomorrow_team(
+            db,
+            task_id=task_id,
+            team_id=user.active_team_id,
+            user_id=user.id,
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail="Not a team member") from e
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -353,6 +733,7 @@ async def move_team_task_to_tomorrow(
 @router.get("/today", response_model=TodayTasksOut)
 async def list_today(
     telegram_id: int = Query(gt=0),
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -360,7 +741,7 @@ async def list_today(
     - если active_team_id есть -> today по команде
     - иначе -> today личные
     """
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         return {"open": [], "done": []}
 
@@ -369,18 +750,21 @@ async def list_today(
     day_end = day_start + timedelta(days=1)
 
     if user.active_team_id:
-        open_tasks = await TaskRepository.list_today_open_by_team(
-            db, user.active_team_id, day_start, day_end
-        )
-        done_tasks = await TaskRepository.list_today_done_by_team(
+        scope, scope_id = SCOPE_TEAM, user.active_team_id
+    else:
+        scope, scope_id = SCOPE_USER, user.id
+    etag = await _today_etag(db, scope, scope_id, day_start.date())
+    not_modified = _not_modified(etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
+
+    if user.active_team_id:
+        open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_team(
             db, user.active_team_id, day_start, day_end
         )
     else:
-        open_tasks = await TaskRepository.list_today_open_by_owner(
-            db, user.id, day_start, day_end
-        )
-        done_tasks = await TaskRepository.list_today_done_by_owner(
+        open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_owner(
             db, user.id, day_start, day_end
         )
 
-    return {"open": open_tasks, "done": done_tasks}
+    return _today_response(open_tasks, done_tasks, etag)
@@ -1,7 +1,13 @@
+import os
+from datetime import datetime, timedelta
+from typing import Literal
+from zoneinfo import ZoneInfo
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
+from app.repository.team_stats import TeamStatsRepository
 from app.repository.teams import TeamRepository
 from app.repository.users import UserRepository
 from app.schemas.team import (
@@ -12,8 +18,11 @@ from app.schemas.team import (
     TeamJoinByCode,
     TeamJoinIn,
     TeamJoinOut,
+    TeamStatsOut,
 )
 
+APP_TZ = ZoneInfo(os.getenv("APP_TZ", "UTC"))
+
 router = APIRouter(prefix="/teams", tags=["teams"])
 
 
@@ -23,7 +32,7 @@ async def create_team(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST,
@@ -43,10 +52,8 @@ async def create_team(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
         ) from e
 
-    # ✅ ключ: сразу делаем команду активной у создателя
-    user.active_team_id = team.id
-    await db.commit()
-    await db.refresh(user)
+    # команда уже активна у создателя (та же транзакция) — сбрасываем кэш
+    UserRepository.invalidate(telegram_id)
 
     return team
 
@@ -58,7 +65,7 @@ async def join_team_by_id(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,7 +92,7 @@ async def get_my_membership(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,7 +114,7 @@ async def join_team_by_code(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -127,9 +134,7 @@ async def join_team_by_code(
     )
 
     # ✅ авто-активация команды после join
-    user.active_team_id = team.id
-    await db.commit()
-    await db.refresh(user)
+    await UserRepository.set_active_team(db, telegram_id=telegram_id, team_id=team.id)
     await db.refresh(member)
 
     return member
@@ -142,7 +147,7 @@ async def activate_team(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,10 +159,8 @@ async def activate_team(
     if not member:
         raise HTTPException(status_code=403, detail="Not a team member")
 
-    user.active_team_id = team_id
-    await db.commit()
-    await db.refresh(user)
-    return {"active_team_id": user.active_team_id}
+    await UserRepository.set_active_team(db, telegram_id=telegram_id, team_id=team_id)
+    return {"active_team_id": team_id}
 
 
 # Team deactivation
@@ -166,16 +169,14 @@ async def deactivate_team(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
-    if user is None:
+    # без предварительного SELECT: UPDATE по telegram_id сам скажет, есть ли user
+    if not await UserRepository.set_active_team(
+        db, telegram_id=telegram_id, team_id=None
+    ):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found. Call /users/upsert first.",
         )
-
-    user.active_team_id = None
-    await db.commit()
-    await db.refresh(user)
     return {"active_team_id": None}
 
 
@@ -186,7 +187,7 @@ async def join_team(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -195,15 +196,15 @@ async def join_team(
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Team not found")
 
     nickname = user.username or user.first_name or f"user_{user.id}"
+    # участник + активная команда — один commit
     await TeamRepository.ensure_member(
         db,
         team_id=team.id,
         user_id=user.id,
         nickname=nickname,
+        commit=False,
     )
-
-    user.active_team_id = team.id
-    await db.commit()
+    await UserRepository.set_active_team(db, telegram_id=telegram_id, team_id=team.id)
 
     return {"team_id": team.id, "name": team.name}
 
@@ -214,7 +215,7 @@ async def my_teams(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -231,7 +232,7 @@ async def active_team_join_code(
     telegram_id: int = Query(gt=0),
     db: AsyncSession = Depends(get_db),
 ):
-    user = await UserRepository.get_by_telegram_id(db, telegram_id)
+    user = await UserRepository.get_identity(db, telegram_id)
     if user is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -243,3 +244,40 @@ async def active_team_join_code(
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Team not found")
 
     return {"team_id": team.id, "name": team.name, "join_code": team.join_code}
+
+
+# Active team stats: сколько задач закрыл каждый участник (по дням/неделям)
+@router.get("/active/stats", response_model=TeamStatsOut)
+async def active_team_stats(
+    telegram_id: int = Query(gt=0),
+    period: Literal["day", "week"] = "day",
+    days: int = Query(7, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+):
+    user = await UserRepository.get_identity(db, telegram_id)
+    if user is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    if user.active_team_id is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Active team is not set")
+
+    member = await TeamRepository(db).get_member(
+        team_id=user.active_team_id, user_id=user.id
+    )
+    if not member:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Not a team member")
+
+    today = datetime.now(APP_TZ).date()
+    since = today - timedelta(days=days - 1)
+    until = today + timedelta(days=1)
+
+    rows = await TeamStatsRepository.list_by_team(
+        db, team_id=user.active_team_id, since=since, until=until, period=period
+    )
+    return {
+        "team_id": user.active_team_id,
+        "period": period,
+        "since": since,
+        "until": until,
+        "rows": rows,
+    }
@@ -52,6 +52,32 @@ class TaskCreateFromBotIn(BaseModel):
         return normalize_time_hhmm(v)
 
 
+class TaskBatchItemIn(BaseModel):
+    """Одна задача в пачке из бота (поля как в TaskCreateFromBotIn)."""
+
+    title: str = Field(min_length=1, max_length=120)
+    description: str | None = Field(default=None, max_length=1500)
+    remind_at: str = Field(min_length=1, max_length=5)
+
+    @field_validator("remind_at")
+    @classmethod
+    def validate_remind_at(cls, v: str) -> str:
+        return normalize_time_hhmm(v)
+
+
+class TaskBatchCreateFromBotIn(BaseModel):
+    """Пачка задач одного пользователя: один upsert + один INSERT."""
+
+    telegram_id: int = Field(gt=0)
+    username: str | None = Field(default=None, max_length=64)
+    first_name: str | None = Field(default=None, max_length=64)
+    tasks: list[TaskBatchItemIn] = Field(min_length=1, max_length=100)
+
+
+class TaskIdsIn(BaseModel):
+    task_ids: list[int] = Field(min_length=1, max_length=500)
+
+
 class TodayTasksOut(BaseModel):
     """
     TodayTasksOut — схема ответа для эндпоинта "задачи на сегодня".
@@ -65,3 +91,37 @@ class TodayTasksOut(BaseModel):
 
     open: list[TaskOut]
     done: list[TaskOut]
+
+
+class TaskPageOut(BaseModel):
+    """
+    Страница списка задач.
+
+    next_cursor — непрозрачная строка для параметра `after` следующего
+    запроса; None, если дальше задач нет.
+    """
+
+    items: list[TaskOut]
+    next_cursor: str | None = None
+
+
+class DueTaskOut(BaseModel):
+    """
+    Задача, по которой нужно отправить напоминание.
+
+    telegram_id — кому слать (владелец задачи), due_at — naive время в APP_TZ.
+    """
+
+    id: int
+    title: str
+    due_at: datetime
+    team_id: int | None = None
+    telegram_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class ReminderAckIn(BaseModel):
+    task_ids: list[int] = Field(min_length=1, max_length=1000)
+    worker_id: str | None = Field(default=None, max_length=64)
@@ -1,3 +1,6 @@
+from datetime import date
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -40,3 +43,18 @@ class TeamJoinIn(BaseModel):
 class TeamJoinOut(BaseModel):
     team_id: int
     name: str
+
+
+class TeamStatsRowOut(BaseModel):
+    period_start: date
+    member_id: int
+    nickname: str
+    done_count: int
+
+
+class TeamStatsOut(BaseModel):
+    team_id: int
+    period: Literal["day", "week"]
+    since: date
+    until: date  # не включительно
+    rows: list[TeamStatsRowOut]
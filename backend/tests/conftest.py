@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.main import app
 from app.db.base import Base
 from app.db.database import get_db
+from app.repository.users import UserRepository
 
 
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -38,6 +39,14 @@ async def db_session(engine):
         await session.rollback()
 
 
+@pytest.fixture(autouse=True)
+def clear_identity_cache():
+    # кэш живёт на уровне процесса — тесты не должны видеть чужие записи
+    UserRepository.clear_identity_cache()
+    yield
+    UserRepository.clear_identity_cache()
+
+
 @pytest.fixture
 async def client(db_session):
 
@@ -0,0 +1,197 @@
+# backend/tests/test_embedded.py
+
+import re
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "bot" / "app"))
+
+from app.repository.users import UserRepository  # noqa: E402
+from embedded import ROUTES, EmbeddedBackend  # noqa: E402
+
+
+@pytest.fixture
+def embedded(engine):
+    return EmbeddedBackend(async_sessionmaker(engine, expire_on_commit=False))
+
+
+def _without_ids(value):
+    if isinstance(value, dict):
+        return {k: _without_ids(v) for k, v in value.items() if k != "id"}
+    if isinstance(value, (list, tuple)):
+        return [_without_ids(v) for v in value]
+    return value
+
+
+class Parity:
+    """
+    Сравнивает HTTP-роуты с embedded-обработчиками и запоминает,
+    какие пути embedded реально прошли.
+    """
+
+    def __init__(self, client, embedded) -> None:
+        self.client = client
+        self.embedded = embedded
+        self.covered: list[tuple[str, str]] = []
+
+    async def http(self, method, path, *, params=None, json=None):
+        r = await self.client.request(method, path, params=params, json=json)
+        # 201 у POST /tasks: боту, как и embedded, важен только успех
+        return (200 if r.is_success else r.status_code), r.json()
+
+    async def inproc(self, method, path, *, params=None, json=None):
+        self.covered.append((method, path))
+        try:
+            body = await self.embedded.request(method, path, params=params, json=json)
+        except httpx.HTTPStatusError as e:
+            return e.response.status_code, e.response.json()
+        return 200, body
+
+    async def same(self, method, path, *, params=None, json=None) -> int:
+        """Чтение или идемпотентный вызов: один и тот же запрос обоими путями."""
+        http = await self.http(method, path, params=params, json=json)
+        inproc = await self.inproc(method, path, params=params, json=json)
+        assert inproc == http, (method, path)
+        return http[0]
+
+    async def twins(
+        self, method, paths, *, params=None, json=None, jsons=None
+    ) -> tuple[dict | list, dict | list]:
+        """
+        Изменяющий вызов: HTTP и embedded получают одинаковые данные-близнецы
+        (paths / jsons — пара для HTTP и для embedded), сравнение без id.
+        """
+        http_path, inproc_path = paths
+        http_json, inproc_json = jsons or (json, json)
+        http = await self.http(method, http_path, params=params, json=http_json)
+        inproc = await self.inproc(method, inproc_path, params=params, json=inproc_json)
+        assert http[0] == 200, http
+        assert _without_ids(inproc) == _without_ids(http), (method, http_path)
+        return http[1], inproc[1]
+
+
+@pytest.mark.asyncio
+async def test_embedded_matches_http_routes(client, embedded, db_session):
+    p = Parity(client, embedded)
+    owner = {"telegram_id": 701}
+    stranger = {"telegram_id": 702}
+    unknown = {"telegram_id": 799}
+
+    # ---- /users/upsert ----
+    for tg in (701, 702):
+        profile = {"telegram_id": tg, "username": f"user{tg}", "first_name": "e"}
+        assert await p.same("POST", "/users/upsert", json=profile) == 200
+    assert await p.same("POST", "/users/upsert", json={"telegram_id": 0}) == 422
+
+    # ---- личные задачи ----
+    payload = {"telegram_id": 701, "title": "mine", "remind_at": "23:59"}
+    personal, twin = await p.twins("POST", ("/tasks", "/tasks"), json=payload)
+    bad_time = {**payload, "remind_at": "25"}
+    assert await p.same("POST", "/tasks", json=bad_time) == 422
+
+    assert await p.same("GET", "/tasks/personal/today", params=owner) == 200
+    card = f"/tasks/personal/{personal['id']}"
+    assert await p.same("GET", card, params=owner) == 200
+    assert await p.same("GET", card, params=unknown) == 404
+    assert await p.same("GET", "/tasks/personal/999999", params=owner) == 404
+
+    for action in ("tomorrow", "done"):
+        await p.twins(
+            "PATCH",
+            (
+                f"/tasks/personal/{personal['id']}/{action}",
+                f"/tasks/personal/{twin['id']}/{action}",
+            ),
+            params=owner,
+        )
+    # повторный done ничего не меняет — можно одним запросом
+    assert await p.same("PATCH", f"{card}/done", params=owner) == 200
+    missing = "/tasks/personal/999999/tomorrow"
+    assert await p.same("PATCH", missing, params=owner) == 404
+
+    batch = [
+        [(await p.http("POST", "/tasks", json=payload))[1]["id"] for _ in range(2)]
+        for _ in range(2)
+    ]
+    for action in ("tomorrow", "done"):
+        http, inproc = await p.twins(
+            "PATCH",
+            (f"/tasks/personal/{action}", f"/tasks/personal/{action}"),
+            params=owner,
+            jsons=tuple({"task_ids": ids} for ids in batch),
+        )
+        assert [t["id"] for t in http] == batch[0]
+        assert [t["id"] for t in inproc] == batch[1]
+    empty = {"task_ids": []}
+    path = "/tasks/personal/done"
+    assert await p.same("PATCH", path, params=owner, json=empty) == 422
+
+    # ---- команда ----
+    r = await client.post(
+        "/teams?telegram_id=701", json={"name": "Team E", "nickname": "lead"}
+    )
+    team_id = r.json()["id"]
+    assert await p.same("GET", "/teams/my", params=owner) == 200
+    assert await p.same("GET", "/teams/my", params=unknown) == 404
+
+    team_task, team_twin = await p.twins("POST", ("/tasks", "/tasks"), json=payload)
+    assert team_task["team_id"] == team_id
+    assert await p.same("GET", "/tasks/team/today", params=owner) == 200
+    assert await p.same("GET", "/tasks/team/today", params=unknown) == 200
+    team_card = f"/tasks/team/{team_task['id']}"
+    assert await p.same("GET", team_card, params=owner) == 200
+    assert await p.same("GET", "/tasks/team/999999", params=owner) == 404
+
+    for action in ("tomorrow", "done"):
+        await p.twins(
+            "PATCH",
+            (
+                f"/tasks/team/{team_task['id']}/{action}",
+                f"/tasks/team/{team_twin['id']}/{action}",
+            ),
+            params=owner,
+        )
+    assert await p.same("PATCH", "/tasks/team/999999/done", params=owner) == 404
+
+    team_batch = [
+        [(await p.http("POST", "/tasks", json=payload))[1]["id"] for _ in range(2)]
+        for _ in range(2)
+    ]
+    for action in ("tomorrow", "done"):
+        await p.twins(
+            "PATCH",
+            (f"/tasks/team/{action}", f"/tasks/team/{action}"),
+            params=owner,
+            jsons=tuple({"task_ids": ids} for ids in team_batch),
+        )
+
+    # 702: активная команда выставлена, но он не участник
+    await UserRepository.set_active_team(db_session, telegram_id=702, team_id=team_id)
+    assert await p.same("GET", team_card, params=stranger) == 200
+    for action in ("done", "tomorrow"):
+        path = f"/tasks/team/{team_task['id']}/{action}"
+        assert await p.same("PATCH", path, params=stranger) == 403
+        none = {"task_ids": [999999]}
+        path = f"/tasks/team/{action}"
+        assert await p.same("PATCH", path, params=stranger, json=none) == 403
+
+    activate = f"/teams/{team_id}/activate"
+    assert await p.same("POST", activate, params=stranger) == 403
+    assert await p.same("POST", activate, params=unknown) == 404
+    assert await p.same("POST", activate, params=owner) == 200
+
+    assert await p.same("POST", "/teams/deactivate", params=owner) == 200
+    assert await p.same("POST", "/teams/deactivate", params=unknown) == 404
+    assert await p.same("GET", "/tasks/team/today", params=owner) == 400
+    assert await p.same("GET", team_card, params=owner) == 400
+    assert await p.same("PATCH", f"{team_card}/done", params=owner) == 400
+
+    # каждый путь, который embedded перехватывает, прошёл сравнение с HTTP
+    for method, pattern, handler in ROUTES:
+        assert any(
+            m == method and re.fullmatch(pattern, path) for m, path in p.covered
+        ), (method, pattern, handler.__name__)
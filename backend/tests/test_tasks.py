@@ -1,7 +1,29 @@
 # backend/tests/test_tasks.py
 
+import base64
+import csv
+import io
+import json
+import os
+import re
+
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import event
+from sqlalchemy.orm.util import identity_key
+
+from app.models.task import Task
+from app.models.team_member import TeamMember
+from app.repository.task_counters import (
+    SCOPE_USER,
+    CounterDeltas,
+    TaskCounterRepository,
+)
+from app.repository.task_reads import TaskReadRepository, TaskRecord
+from app.repository.users import UserRepository
+from app.schemas.task import TodayTasksOut
 
 
 @pytest.mark.asyncio
@@ -129,3 +151,600 @@ async def test_context_today_returns_empty_for_unknown_user(client):
     data = r.json()
     assert data["open"] == []
     assert data["done"] == []
+
+
+@pytest.mark.asyncio
+async def test_due_window_returns_open_tasks_in_range_paginated(client):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 401, "username": "r", "first_name": "r"}
+    )
+    base = datetime(2031, 5, 1, 12, 0)
+    ids = []
+    for minutes in (0, 0, 5, 30):
+        r = await client.post(
+            "/tasks/personal?telegram_id=401",
+            json={
+                "title": f"t{minutes}",
+                "description": None,
+                "due_at": (base + timedelta(minutes=minutes)).isoformat(),
+            },
+        )
+        assert r.status_code == 200, r.text
+        ids.append(r.json()["id"])
+
+    # done задачи в окно не попадают
+    r = await client.patch(f"/tasks/personal/{ids[2]}/done?telegram_id=401")
+    assert r.status_code == 200, r.text
+
+    params = {
+        "since": base.isoformat(),
+        "until": (base + timedelta(minutes=10)).isoformat(),
+        "limit": 1,
+    }
+    r1 = await client.get("/tasks/due", params=params)
+    assert r1.status_code == 200, r1.text
+    page1 = r1.json()
+    assert [t["id"] for t in page1] == [ids[0]]
+    assert page1[0]["telegram_id"] == 401
+
+    r2 = await client.get(
+        "/tasks/due",
+        params={
+            **params,
+            "after_due_at": page1[0]["due_at"],
+            "after_id": page1[0]["id"],
+        },
+    )
+    assert [t["id"] for t in r2.json()] == [ids[1]]
+
+    r3 = await client.get(
+        "/tasks/due",
+        params={**params, "after_due_at": base.isoformat(), "after_id": ids[1]},
+    )
+    assert r3.json() == []
+
+
+@pytest.mark.asyncio
+async def test_reminder_claim_is_exclusive_and_ack_is_final(client):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 402, "username": "r", "first_name": "r"}
+    )
+    # due_at хранится naive по APP_TZ (как TaskRepository._now_local)
+    now_local = datetime.now(ZoneInfo(os.getenv("APP_TZ", "UTC"))).replace(tzinfo=None)
+    past = now_local - timedelta(minutes=5)
+    ids = set()
+    for i in range(3):
+        r = await client.post(
+            "/tasks/personal?telegram_id=402",
+            json={"title": f"due{i}", "description": None, "due_at": past.isoformat()},
+        )
+        ids.add(r.json()["id"])
+
+    r1 = await client.post(
+        "/tasks/reminders/claim", params={"worker_id": "w1", "limit": 2}
+    )
+    assert r1.status_code == 200, r1.text
+    claimed_w1 = {t["id"] for t in r1.json()} & ids
+    assert len(claimed_w1) == 2
+
+    r2 = await client.post(
+        "/tasks/reminders/claim", params={"worker_id": "w2", "limit": 100}
+    )
+    claimed_w2 = {t["id"] for t in r2.json()} & ids
+    assert claimed_w2 == ids - claimed_w1
+
+    # чужой воркер не может подтвердить не свою аренду
+    r = await client.post(
+        "/tasks/reminders/ack",
+        json={"worker_id": "w2", "task_ids": sorted(claimed_w1)},
+    )
+    assert r.json()["acked"] == 0
+
+    r = await client.post(
+        "/tasks/reminders/ack",
+        json={"worker_id": "w1", "task_ids": sorted(claimed_w1)},
+    )
+    assert r.json()["acked"] == 2
+
+    # отправленные больше не попадают ни в окно, ни в claim
+    r = await client.get(
+        "/tasks/due",
+        params={
+            "since": (past - timedelta(minutes=1)).isoformat(),
+            "until": (past + timedelta(minutes=1)).isoformat(),
+        },
+    )
+    assert not ({t["id"] for t in r.json()} & claimed_w1)
+
+
+@pytest.mark.asyncio
+async def test_today_returns_open_and_done_in_one_query(client, engine):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 403, "username": "d", "first_name": "d"}
+    )
+    today = datetime.now(ZoneInfo(os.getenv("APP_TZ", "UTC"))).date()
+    ids = []
+    for hour in (9, 12, 18):
+        r = await client.post(
+            "/tasks/personal?telegram_id=403",
+            json={
+                "title": f"t{hour}",
+                "description": None,
+                "due_at": datetime.combine(today, time(hour)).isoformat(),
+            },
+        )
+        ids.append(r.json()["id"])
+    await client.patch(f"/tasks/personal/{ids[1]}/done?telegram_id=403")
+
+    # первый вызов прогревает кэш пользователя
+    await client.get("/tasks/today?telegram_id=403")
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        r = await client.get("/tasks/today?telegram_id=403")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert [t["id"] for t in data["open"]] == [ids[0], ids[2]]
+    assert [t["id"] for t in data["done"]] == [ids[1]]
+    # версия scope для ETag + один запрос по tasks
+    assert len(statements) == 2
+    assert "scope_versions" in statements[0]
+
+
+async def _query_plan(engine, statement, parameters) -> str:
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        )
+        return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_today_queries_use_composite_indexes(client, engine):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 404, "username": "i", "first_name": "i"}
+    )
+    r = await client.post(
+        "/teams?telegram_id=404", json={"name": "Index team", "nickname": "indexer"}
+    )
+    assert r.status_code == 200, r.text
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        if "FROM tasks" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await client.get("/tasks/team/today?telegram_id=404")
+        await client.get("/tasks/personal/today?telegram_id=404")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert len(captured) == 2
+    team_plan = await _query_plan(engine, *captured[0])
+    personal_plan = await _query_plan(engine, *captured[1])
+    assert "USING INDEX ix_tasks_team_status_due_at" in team_plan, team_plan
+    assert (
+        "USING INDEX ix_tasks_personal_owner_status_due_at" in personal_plan
+    ), personal_plan
+
+
+@pytest.mark.asyncio
+async def test_reminder_queries_use_pending_index(client, engine):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        if "reminded_at IS NULL" in statement:
+            captured.append((statement, parameters))
+
+    now = datetime.now(ZoneInfo(os.getenv("APP_TZ", "UTC"))).replace(tzinfo=None)
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await client.get(
+            "/tasks/due",
+            params={
+                "since": now.isoformat(),
+                "until": (now + timedelta(minutes=10)).isoformat(),
+            },
+        )
+        await client.post("/tasks/reminders/claim", params={"worker_id": "plan"})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    # окно и claim идут по частичному индексу, (status, due_at) им не нужен
+    assert len(captured) == 2
+    for statement, parameters in captured:
+        plan = await _query_plan(engine, statement, parameters)
+        assert "ix_tasks_remind_pending" in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_create_from_bot_is_one_transaction(client, engine):
+    statements = []
+    commits = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        r = await client.post(
+            "/tasks",
+            json={
+                "telegram_id": 405,
+                "title": "one tx",
+                "description": None,
+                "remind_at": "18",
+                "username": "u",
+                "first_name": "f",
+            },
+        )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    assert r.status_code == 201, r.text
+    assert r.json()["title"] == "one tx"
+    assert r.json()["done_by_nickname"] is None
+    # upsert пользователя + INSERT задачи + счётчик + версия scope, без refresh
+    assert len(statements) == 4
+    assert len(commits) == 1
+
+
+@pytest.mark.asyncio
+async def test_team_transitions_check_membership_in_one_statement(
+    client, db_session, engine
+):
+    for tg in (601, 602, 603):
+        await client.post(
+            "/users/upsert", json={"telegram_id": tg, "username": "u", "first_name": "u"}
+        )
+    r = await client.post(
+        "/teams?telegram_id=601", json={"name": "Team T", "nickname": "owner"}
+    )
+    team_id = r.json()["id"]
+    r = await client.post(
+        "/tasks",
+        json={"telegram_id": 601, "title": "team task", "remind_at": "18:30"},
+    )
+    task = r.json()
+    assert task["team_id"] == team_id
+
+    # 602: активная команда выставлена, но в team_members его нет
+    # 603: полноценный участник
+    mate = await UserRepository.get_identity(db_session, 603)
+    db_session.add(TeamMember(team_id=team_id, user_id=mate.id, nickname="mate"))
+    await db_session.commit()
+    for tg in (602, 603):
+        await UserRepository.set_active_team(db_session, telegram_id=tg, team_id=team_id)
+
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        # только запросы к задачам и участникам: identity, счётчики и версии не в счёт
+        if re.search(r"\b(tasks|team_members)\b", statement):
+            statements.append(statement.split()[0])
+
+    async def patch(url, **kwargs):
+        statements.clear()
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            return await client.patch(url, **kwargs)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+
+    # не участник, задача есть: 403 прямо из RETURNING одного UPDATE
+    for action in ("done", "tomorrow"):
+        r = await patch(f"/tasks/team/{task['id']}/{action}?telegram_id=602")
+        assert r.status_code == 403, r.text
+        assert statements == ["UPDATE"]
+    # UPDATE не задел строк: участие и наличие задачи — одним SELECT
+    r = await patch("/tasks/team/999999/done?telegram_id=602")
+    assert r.status_code == 403, r.text
+    assert statements == ["UPDATE", "SELECT"]
+    for action in ("done", "tomorrow"):
+        r = await patch(
+            f"/tasks/team/{action}?telegram_id=602", json={"task_ids": [999999]}
+        )
+        assert r.status_code == 403, r.text
+        assert statements == ["UPDATE", "SELECT"]
+    r = await patch("/tasks/team/999999/done?telegram_id=603")
+    assert r.status_code == 404, r.text
+    assert statements == ["UPDATE", "SELECT"]
+
+    r = await client.get(f"/tasks/team/{task['id']}?telegram_id=601")
+    assert r.json()["status"] == "todo"
+    assert r.json()["due_at"] == task["due_at"]
+
+    r = await patch(f"/tasks/team/{task['id']}/tomorrow?telegram_id=603")
+    assert r.status_code == 200, r.text
+    assert statements == ["UPDATE"]
+    assert datetime.fromisoformat(r.json()["due_at"]) == datetime.fromisoformat(
+        task["due_at"]
+    ) + timedelta(days=1)
+
+    r = await patch(f"/tasks/team/{task['id']}/done?telegram_id=601")
+    assert r.json()["done_by_nickname"] == "owner"
+    # UPDATE + подгрузка done_by_member для nickname в ответе
+    assert statements == ["UPDATE", "SELECT"]
+    # второй "done" не перетирает того, кто закрыл задачу первым
+    r = await patch(f"/tasks/team/{task['id']}/done?telegram_id=603")
+    assert r.status_code == 200, r.text
+    # UPDATE без строк + SELECT участия/задачи + nickname в ответе
+    assert statements == ["UPDATE", "SELECT", "SELECT"]
+    assert r.json()["status"] == "done"
+    assert r.json()["done_by_nickname"] == "owner"
+
+
+@pytest.mark.asyncio
+async def test_batch_create_done_and_snooze(client, engine):
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 406,
+            "username": "b",
+            "first_name": "b",
+            "tasks": [{"title": f"b{i}", "remind_at": "9"} for i in range(5)],
+        },
+    )
+    assert r.status_code == 201, r.text
+    created = r.json()
+    assert [t["title"] for t in created] == [f"b{i}" for i in range(5)]
+    ids = [t["id"] for t in created]
+
+    # чужой пользователь ничего не трогает
+    await client.post(
+        "/users/upsert", json={"telegram_id": 407, "username": "x", "first_name": "x"}
+    )
+    r = await client.patch(
+        "/tasks/personal/done?telegram_id=407", json={"task_ids": ids}
+    )
+    assert r.json() == []
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE"):
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        r = await client.patch(
+            "/tasks/personal/tomorrow?telegram_id=406", json={"task_ids": ids[:3]}
+        )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    assert r.status_code == 200, r.text
+    assert len(statements) == 1
+    snoozed = {t["id"]: t["due_at"] for t in r.json()}
+    for t in created[:3]:
+        assert datetime.fromisoformat(snoozed[t["id"]]) == datetime.fromisoformat(
+            t["due_at"]
+        ) + timedelta(days=1)
+
+    r = await client.patch(
+        "/tasks/personal/done?telegram_id=406", json={"task_ids": ids[1:] + [999999]}
+    )
+    assert r.status_code == 200, r.text
+    assert [t["id"] for t in r.json()] == ids[1:]
+    assert {t["status"] for t in r.json()} == {"done"}
+
+
+@pytest.mark.asyncio
+async def test_personal_list_is_keyset_paginated(client):
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 408,
+            "tasks": [{"title": f"p{i}", "remind_at": "10"} for i in range(5)],
+        },
+    )
+    ids = sorted((t["id"] for t in r.json()), reverse=True)
+
+    seen = []
+    after = None
+    while True:
+        params = {"telegram_id": 408, "limit": 2}
+        if after:
+            params["after"] = after
+        r = await client.get("/tasks/personal", params=params)
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert len(page["items"]) <= 2
+        seen += [t["id"] for t in page["items"]]
+        after = page["next_cursor"]
+        if after is None:
+            break
+
+    assert seen == ids
+
+    r = await client.get("/tasks/personal?telegram_id=408&after=garbage")
+    assert r.status_code == 400, r.text
+    overflow = base64.urlsafe_b64encode(b'{"id":1e999}').decode()
+    r = await client.get(
+        "/tasks/personal", params={"telegram_id": 408, "after": overflow}
+    )
+    assert r.status_code == 400, r.text
+    r = await client.get("/tasks/personal?telegram_id=408&limit=1000")
+    assert r.status_code == 422, r.text
+
+
+@pytest.mark.asyncio
+async def test_export_streams_ndjson_and_csv(client):
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 409,
+            "tasks": [
+                {"title": "plain", "remind_at": "10"},
+                {
+                    "title": 'with "quotes", commas',
+                    "description": "x\ny",
+                    "remind_at": "11",
+                },
+            ],
+        },
+    )
+    ids = [t["id"] for t in r.json()]
+
+    r = await client.get("/tasks/personal/export?telegram_id=409")
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [t["id"] for t in lines] == ids
+    assert lines[1]["description"] == "x\ny"
+
+    r = await client.get("/tasks/personal/export?telegram_id=409&format=csv")
+    assert r.status_code == 200, r.text
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows[0][:2] == ["id", "title"]
+    assert [row[1] for row in rows[1:]] == ["plain", 'with "quotes", commas']
+
+    r = await client.get("/tasks/personal/export?telegram_id=409&format=xml")
+    assert r.status_code == 422, r.text
+
+
+@pytest.mark.asyncio
+async def test_task_counters_follow_writes_and_rebuild(client, db_session):
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 410,
+            "tasks": [{"title": f"c{i}", "remind_at": "10"} for i in range(4)],
+        },
+    )
+    ids = [t["id"] for t in r.json()]
+    user = await UserRepository.get_identity(db_session, 410)
+
+    await client.patch(
+        "/tasks/personal/done?telegram_id=410", json={"task_ids": ids[:2]}
+    )
+    # повторный done и перенос не меняют статусы -> счётчики те же
+    await client.patch(f"/tasks/personal/{ids[0]}/done?telegram_id=410")
+    await client.patch(f"/tasks/personal/{ids[3]}/tomorrow?telegram_id=410")
+
+    expected = {"todo": 2, "done": 2}
+    assert await TaskCounterRepository.get(db_session, SCOPE_USER, user.id) == expected
+    r = await client.get("/tasks/personal/count?telegram_id=410")
+    assert r.json() == {"count": 4}
+
+    # расхождение чинится пересчётом
+    await TaskCounterRepository.apply(
+        db_session, CounterDeltas({(SCOPE_USER, user.id, "todo"): 5})
+    )
+    await db_session.commit()
+    await TaskCounterRepository.rebuild(db_session)
+    assert await TaskCounterRepository.get(db_session, SCOPE_USER, user.id) == expected
+
+
+@pytest.mark.asyncio
+async def test_today_etag_returns_304_until_scope_changes(client, engine):
+    r = await client.post(
+        "/tasks",
+        json={"telegram_id": 411, "title": "etag", "remind_at": "23:59"},
+    )
+    task_id = r.json()["id"]
+
+    r = await client.get("/tasks/personal/today?telegram_id=411")
+    assert r.status_code == 200, r.text
+    etag = r.headers["etag"]
+    r = await client.get("/tasks/today?telegram_id=411")
+    assert r.headers["etag"] == etag
+
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    try:
+        r = await client.get(
+            "/tasks/personal/today?telegram_id=411",
+            headers={"If-None-Match": etag},
+        )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+    assert r.status_code == 304, r.text
+    assert r.content == b""
+    # только версия scope (identity из кэша), списки не читаются
+    assert len(statements) == 1
+    assert "scope_versions" in statements[0]
+
+    await client.patch(f"/tasks/personal/{task_id}/done?telegram_id=411")
+    r = await client.get(
+        "/tasks/personal/today?telegram_id=411", headers={"If-None-Match": etag}
+    )
+    assert r.status_code == 200, r.text
+    assert r.headers["etag"] != etag
+    assert [t["id"] for t in r.json()["done"]] == [task_id]
+
+
+@pytest.mark.asyncio
+async def test_today_fast_path_matches_task_out(client):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 412, "username": "f", "first_name": "f"}
+    )
+    await client.post(
+        "/teams?telegram_id=412", json={"name": "Team F", "nickname": "fast"}
+    )
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 412,
+            "tasks": [
+                {"title": "a", "description": "d", "remind_at": "23:58"},
+                {"title": "b", "remind_at": "23:59"},
+            ],
+        },
+    )
+    created = r.json()
+    # PATCH отдаёт ORM Task через TaskOut — эталон формы
+    r = await client.patch(f"/tasks/team/{created[0]['id']}/done?telegram_id=412")
+    done = r.json()
+    assert done["done_by_nickname"] == "fast"
+
+    r = await client.get("/tasks/team/today?telegram_id=412")
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert TodayTasksOut.model_validate(data).model_dump(mode="json") == data
+    assert data == {"open": [created[1]], "done": [done]}
+
+    r = await client.get(f"/tasks/team/{done['id']}?telegram_id=412")
+    assert r.json() == done
+
+
+@pytest.mark.asyncio
+async def test_read_repository_skips_identity_map(client, db_session):
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 413,
+            "tasks": [{"title": f"r{i}", "remind_at": "10"} for i in range(3)],
+        },
+    )
+    ids = [t["id"] for t in r.json()]
+    user = await UserRepository.get_identity(db_session, 413)
+
+    records = await TaskReadRepository.list_by_owner(db_session, user.id, limit=2)
+    assert [t.id for t in records] == ids[::-1][:2]
+    assert all(isinstance(t, TaskRecord) for t in records)
+    # строки не попали в identity map сессии
+    for t in records:
+        assert db_session.identity_map.get(identity_key(Task, t.id)) is None
+
+    r = await client.get("/tasks/personal?telegram_id=413&limit=2")
+    assert [t["id"] for t in r.json()["items"]] == ids[::-1][:2]
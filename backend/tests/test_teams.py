@@ -0,0 +1,129 @@
+# backend/tests/test_teams.py
+
+import pytest
+from sqlalchemy import event
+
+from app.repository.team_stats import TeamStatsRepository
+
+
+@pytest.mark.asyncio
+async def test_active_team_switch_is_visible_immediately(client):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 501, "username": "lead", "first_name": "l"}
+    )
+
+    # прогреваем кэш identity: активной команды нет
+    r = await client.get("/tasks/team/today?telegram_id=501")
+    assert r.status_code == 400, r.text
+
+    r = await client.post(
+        "/teams?telegram_id=501", json={"name": "Team A", "nickname": "lead"}
+    )
+    assert r.status_code == 200, r.text
+    team_id = r.json()["id"]
+
+    # create_team активирует команду и сбрасывает кэш
+    r = await client.get("/tasks/team/today?telegram_id=501")
+    assert r.status_code == 200, r.text
+
+    r = await client.post("/teams/deactivate?telegram_id=501")
+    assert r.status_code == 200, r.text
+    r = await client.get("/tasks/team/today?telegram_id=501")
+    assert r.status_code == 400, r.text
+
+    r = await client.post(f"/teams/{team_id}/activate?telegram_id=501")
+    assert r.json() == {"active_team_id": team_id}
+    r = await client.get("/tasks/team/today?telegram_id=501")
+    assert r.status_code == 200, r.text
+
+
+@pytest.mark.asyncio
+async def test_active_team_stats_follow_done_and_rebuild(client, db_session):
+    await client.post(
+        "/users/upsert", json={"telegram_id": 511, "username": "lead", "first_name": "l"}
+    )
+    r = await client.post(
+        "/teams?telegram_id=511", json={"name": "Team S", "nickname": "lead"}
+    )
+    assert r.status_code == 200, r.text
+    team_id = r.json()["id"]
+
+    r = await client.post(
+        "/tasks/batch",
+        json={
+            "telegram_id": 511,
+            "tasks": [{"title": f"s{i}", "remind_at": "10"} for i in range(3)],
+        },
+    )
+    ids = [t["id"] for t in r.json()]
+    await client.patch("/tasks/team/done?telegram_id=511", json={"task_ids": ids[:2]})
+    # повторное закрытие не считается второй раз
+    await client.patch(f"/tasks/team/{ids[0]}/done?telegram_id=511")
+
+    r = await client.get("/teams/active/stats?telegram_id=511")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["team_id"] == team_id
+    assert [(row["nickname"], row["done_count"]) for row in body["rows"]] == [
+        ("lead", 2)
+    ]
+
+    r = await client.get("/teams/active/stats?telegram_id=511&period=week")
+    assert [row["done_count"] for row in r.json()["rows"]] == [2]
+
+    # агрегат пересобирается из tasks.done_at
+    await TeamStatsRepository.rebuild(db_session)
+    r = await client.get("/teams/active/stats?telegram_id=511")
+    assert r.json()["rows"] == body["rows"]
+
+    r = await client.get("/teams/active/stats?telegram_id=512")
+    assert r.status_code == 404, r.text
+
+
+@pytest.mark.asyncio
+async def test_team_create_and_join_activate_in_one_commit(client, engine):
+    for tg in (521, 522):
+        await client.post(
+            "/users/upsert",
+            json={"telegram_id": tg, "username": f"user{tg}", "first_name": "u"},
+        )
+
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        r = await client.post(
+            "/teams?telegram_id=521", json={"name": "Team J", "nickname": "lead"}
+        )
+        assert r.status_code == 200, r.text
+        team = r.json()
+        assert len(commits) == 1
+
+        r = await client.post(
+            "/teams/join?telegram_id=522", json={"join_code": team["join_code"]}
+        )
+        assert r.status_code == 200, r.text
+        assert len(commits) == 2
+
+        r = await client.post("/teams/deactivate?telegram_id=521")
+        assert r.json() == {"active_team_id": None}
+        assert len(commits) == 3
+    finally:
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    r = await client.get("/teams/my?telegram_id=522")
+    assert r.json()["active_team_id"] == team["id"]
+    r = await client.get("/teams/my?telegram_id=521")
+    assert r.json()["active_team_id"] is None
+
+    # повторный join ничего не ломает
+    r = await client.post(
+        "/teams/join?telegram_id=522", json={"join_code": team["join_code"]}
+    )
+    assert r.status_code == 200, r.text
+
+    r = await client.post("/teams/deactivate?telegram_id=529")
+    assert r.status_code == 404, r.text
@@ -1,6 +1,7 @@
 # backend/tests/test_users.py
 
 import pytest
+from sqlalchemy import event
 
 
 import pytest
@@ -20,3 +21,40 @@ async def test_create_user(client):
     data = r.json()
     assert data["telegram_id"] == 123
     assert data["username"] == "rustam"
+
+
+@pytest.mark.asyncio
+async def test_upsert_updates_existing_user_in_place(client):
+    r1 = await client.post(
+        "/users/upsert",
+        json={"telegram_id": 124, "username": "old", "first_name": "Old"},
+    )
+    r2 = await client.post(
+        "/users/upsert",
+        json={"telegram_id": 124, "username": "new", "first_name": None},
+    )
+    assert r2.status_code == 200, r2.text
+    assert r2.json()["id"] == r1.json()["id"]
+    assert r2.json()["username"] == "new"
+    assert r2.json()["first_name"] is None
+
+
+@pytest.mark.asyncio
+async def test_upsert_with_same_profile_does_not_write(client, engine):
+    payload = {"telegram_id": 125, "username": "same", "first_name": None}
+    r1 = await client.post("/users/upsert", json=payload)
+
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        r2 = await client.post("/users/upsert", json=payload)
+    finally:
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    assert r2.status_code == 200, r2.text
+    assert r2.json() == r1.json()
+    assert commits == []
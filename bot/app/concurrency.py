@@ -0,0 +1,51 @@
+"""
+Параллельная обработка апдейтов с сохранением порядка внутри чата.
+
+aiogram и так запускает каждый апдейт отдельной задачей (handle_as_tasks),
+но без ограничений: один медленный backend-вызов ничего не блокирует,
+зато тысяча апдейтов — это тысяча одновременных запросов в backend,
+а два быстрых нажатия в одном чате гоняются за FSM-состояние.
+
+ChatOrderedIsolation подключается как events_isolation диспетчера:
+FSMContextMiddleware берёт этот lock ДО чтения состояния, поэтому
+- апдейты одного чата выполняются строго по очереди (FIFO asyncio.Lock);
+- разные чаты идут параллельно, но не больше `concurrency` одновременно.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator, Hashable
+from contextlib import asynccontextmanager
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+
+class ChatOrderedIsolation(BaseEventIsolation):
+    def __init__(self, concurrency: int = 32) -> None:
+        self._slots = asyncio.Semaphore(concurrency)
+        # chat -> (lock, сколько апдейтов его держат/ждут); пустые удаляем,
+        # чтобы память не росла с числом чатов (в отличие от SimpleEventIsolation)
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    @staticmethod
+    def _chat_key(key: StorageKey) -> Hashable:
+        return key.bot_id, key.chat_id, key.thread_id
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        chat = self._chat_key(key)
+        lock, refs = self._locks.get(chat) or (asyncio.Lock(), 0)
+        self._locks[chat] = (lock, refs + 1)
+        try:
+            # сначала очередь своего чата, потом глобальный слот:
+            # ожидание в очереди чата не занимает место у других чатов
+            async with lock, self._slots:
+                yield
+        finally:
+            lock, refs = self._locks[chat]
+            if refs == 1:
+                del self._locks[chat]
+            else:
+                self._locks[chat] = (lock, refs - 1)
+
+    async def close(self) -> None:
+        self._locks.clear()
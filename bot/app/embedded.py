@@ -0,0 +1,305 @@
+"""
+Embedded-режим: бот и backend в одном процессе (BACKEND_MODE=embedded).
+
+Горячие вызовы бота (today, карточка задачи, done/tomorrow, создание задачи,
+upsert пользователя, переключение команды) идут прямо в репозитории backend
+на общем async engine — без HTTP, JSON и сетевого хопа. Остальные пути
+(напоминания, экспорт, создание/вступление в команду) обслуживает то же
+FastAPI-приложение через httpx.ASGITransport, тоже без сети.
+
+Ошибки — httpx.HTTPStatusError с тем же статусом и {"detail": ...},
+что вернул бы backend, поэтому обработчики в main.py не меняются.
+
+Нужны исходники backend (BACKEND_SRC) и его зависимости в окружении бота,
+а также DATABASE_URL backend. Готовая сборка — bot/Dockerfile.embedded
+(docker compose --profile embedded up db bot-embedded).
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, time, timedelta
+from http import HTTPStatus
+from pathlib import Path
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+BACKEND_SRC = os.getenv(
+    "BACKEND_SRC", str(Path(__file__).resolve().parents[2] / "backend")
+)
+if BACKEND_SRC not in sys.path:
+    sys.path.insert(0, BACKEND_SRC)
+
+from app.db.database import SessionLocal, engine  # noqa: E402
+from app.main import app as backend_app  # noqa: E402
+from app.repository.task_reads import TaskReadRepository  # noqa: E402
+from app.repository.tasks import APP_TZ, TaskRepository  # noqa: E402
+from app.repository.teams import TeamRepository  # noqa: E402
+from app.repository.users import UserRepository  # noqa: E402
+from app.schemas.task import TaskCreateFromBotIn, TaskIdsIn, TaskOut  # noqa: E402
+from app.schemas.user import UserOut, UserUpsertIn  # noqa: E402
+
+BASE_URL = "http://backend"
+
+_TASK_FIELDS = tuple(TaskOut.model_fields)
+_USER_FIELDS = tuple(UserOut.model_fields)
+
+
+class _Error(Exception):
+    def __init__(self, status_code: int, detail) -> None:
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _task(task) -> dict:
+    """Task / TaskRecord -> dict в форме TaskOut (как после JSON backend)."""
+    data = {field: getattr(task, field) for field in _TASK_FIELDS}
+    if data["due_at"] is not None:
+        data["due_at"] = data["due_at"].isoformat()
+    return data
+
+
+def _today_bounds() -> tuple[datetime, datetime]:
+    now_local = datetime.now(APP_TZ).replace(tzinfo=None)
+    day_start = datetime.combine(now_local.date(), time.min)
+    return day_start, day_start + timedelta(days=1)
+
+
+NO_USER = "User not found"
+# так отвечают роуты /teams/{id}/activate и /teams/deactivate
+NO_USER_UPSERT = "User not found. Call /users/upsert first."
+
+
+async def _identity(db, params: dict, detail: str = NO_USER):
+    user = await UserRepository.get_identity(db, int(params["telegram_id"]))
+    if user is None:
+        raise _Error(HTTPStatus.NOT_FOUND, detail)
+    return user
+
+
+def _active_team_id(user) -> int:
+    if user.active_team_id is None:
+        raise _Error(HTTPStatus.BAD_REQUEST, "No active team")
+    return user.active_team_id
+
+
+# ---------- handlers: (db, match, params, json) -> dict | list ----------
+async def upsert_user(db, match, params, json):
+    payload = UserUpsertIn.model_validate(json)
+    user = await UserRepository.upsert(
+        db, payload.telegram_id, payload.username, payload.first_name
+    )
+    return {field: getattr(user, field) for field in _USER_FIELDS}
+
+
+async def create_task(db, match, params, json):
+    payload = TaskCreateFromBotIn.model_validate(json)
+    task = await TaskRepository.create_from_bot(
+        db,
+        telegram_id=payload.telegram_id,
+        title=payload.title,
+        description=payload.description,
+        remind_at=payload.remind_at,
+        username=payload.username,
+        first_name=payload.first_name,
+    )
+    return _task(task)
+
+
+async def today(db, match, params, json):
+    user = await UserRepository.get_identity(db, int(params["telegram_id"]))
+    if user is None:
+        return {"open": [], "done": []}
+
+    day_start, day_end = _today_bounds()
+    if match[1] == "personal":
+        open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_owner(
+            db, user.id, day_start, day_end
+        )
+    else:
+        open_tasks, done_tasks = await TaskReadRepository.list_today_split_by_team(
+            db, _active_team_id(user), day_start, day_end
+        )
+    return {
+        "open": [_task(t) for t in open_tasks],
+        "done": [_task(t) for t in done_tasks],
+    }
+
+
+async def get_task(db, match, params, json):
+    user = await _identity(db, params)
+    task_id = int(match[2])
+    if match[1] == "personal":
+        task = await TaskReadRepository.get_personal(
+            db, task_id=task_id, owner_user_id=user.id
+        )
+    else:
+        task = await TaskReadRepository.get_team(
+            db, task_id=task_id, team_id=_active_team_id(user)
+        )
+    if task is None:
+        raise _Error(HTTPStatus.NOT_FOUND, "Task not found")
+    return _task(task)
+
+
+async def transition_one(db, match, params, json):
+    user = await _identity(db, params)
+    mode, task_id, action = match[1], int(match[2]), match[3]
+    if mode == "personal":
+        method = (
+            TaskRepository.mark_done_personal
+            if action == "done"
+            else TaskRepository.snooze_to_tomorrow_personal
+        )
+        task = await method(db, task_id=task_id, owner_user_id=user.id)
+    else:
+        method = (
+            TaskRepository.mark_done_team
+            if action == "done"
+            else TaskRepository.snooze_to_tomorrow_team
+        )
+        task = await method(
+            db, task_id=task_id, team_id=_active_team_id(user), user_id=user.id
+        )
+    if task is None:
+        raise _Error(HTTPStatus.NOT_FOUND, "Task not found")
+    return _task(task)
+
+
+async def transition_many(db, match, params, json):
+    user = await _identity(db, params)
+    task_ids = TaskIdsIn.model_validate(json).task_ids
+    mode, action = match[1], match[2]
+    if mode == "personal":
+        method = (
+            TaskRepository.mark_done_personal_many
+            if action == "done"
+            else TaskRepository.snooze_to_tomorrow_personal_many
+        )
+        tasks = await method(db, task_ids=task_ids, owner_user_id=user.id)
+    else:
+        method = (
+            TaskRepository.mark_done_team_many
+            if action == "done"
+            else TaskRepository.snooze_to_tomorrow_team_many
+        )
+        tasks = await method(
+            db, task_ids=task_ids, team_id=_active_team_id(user), user_id=user.id
+        )
+    return [_task(t) for t in tasks]
+
+
+async def my_teams(db, match, params, json):
+    user = await _identity(db, params)
+    teams = await TeamRepository.list_for_user(db, user_id=user.id)
+    return {
+        "active_team_id": user.active_team_id,
+        "teams": [{"id": t.id, "name": t.name} for t in teams],
+    }
+
+
+async def activate_team(db, match, params, json):
+    user = await _identity(db, params, NO_USER_UPSERT)
+    team_id = int(match[1])
+    member = await TeamRepository(db).get_member(team_id=team_id, user_id=user.id)
+    if not member:
+        raise _Error(HTTPStatus.FORBIDDEN, "Not a team member")
+    await UserRepository.set_active_team(
+        db, telegram_id=user.telegram_id, team_id=team_id
+    )
+    return {"active_team_id": team_id}
+
+
+async def deactivate_team(db, match, params, json):
+    if not await UserRepository.set_active_team(
+        db, telegram_id=int(params["telegram_id"]), team_id=None
+    ):
+        raise _Error(HTTPStatus.NOT_FOUND, NO_USER_UPSERT)
+    return {"active_team_id": None}
+
+
+ROUTES = [
+    ("POST", r"/users/upsert", upsert_user),
+    ("POST", r"/tasks", create_task),
+    ("GET", r"/tasks/(personal|team)/today", today),
+    ("GET", r"/tasks/(personal|team)/(\d+)", get_task),
+    ("PATCH", r"/tasks/(personal|team)/(\d+)/(done|tomorrow)", transition_one),
+    ("PATCH", r"/tasks/(personal|team)/(done|tomorrow)", transition_many),
+    ("GET", r"/teams/my", my_teams),
+    ("POST", r"/teams/(\d+)/activate", activate_team),
+    ("POST", r"/teams/deactivate", deactivate_team),
+]
+
+
+class EmbeddedBackend:
+    """Маршрутизатор вызовов бота на репозитории backend."""
+
+    def __init__(self, session_factory=SessionLocal) -> None:
+        self.app = backend_app
+        self._session_factory = session_factory
+        self._routes = [
+            (method, re.compile(pattern), handler)
+            for method, pattern, handler in ROUTES
+        ]
+
+    def has_route(self, method: str, path: str) -> bool:
+        return self._resolve(method, path) is not None
+
+    def _resolve(self, method: str, path: str):
+        for route_method, pattern, handler in self._routes:
+            if route_method == method:
+                match = pattern.fullmatch(path)
+                if match:
+                    return handler, match
+        return None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: dict | None = None,
+        json: dict | None = None,
+    ) -> dict | list:
+        """Выполнить вызов в процессе; пути без обработчика — через has_route."""
+        resolved = self._resolve(method, path)
+        if resolved is None:
+            raise LookupError(f"{method} {path} has no embedded handler")
+        handler, match = resolved
+
+        try:
+            async with self._session_factory() as db:
+                return await handler(db, match, params or {}, json)
+        except ValidationError as e:
+            # как RequestValidationError в FastAPI: loc от "body", ctx сохранён
+            detail = [
+                {**err, "loc": ["body", *err["loc"]]}
+                for err in e.errors(include_url=False)
+            ]
+            raise self._status_error(
+                method,
+                path,
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                jsonable_encoder(detail),
+            ) from e
+        except PermissionError as e:
+            raise self._status_error(
+                method, path, HTTPStatus.FORBIDDEN, "Not a team member"
+            ) from e
+        except _Error as e:
+            raise self._status_error(method, path, e.status_code, e.detail) from e
+
+    @staticmethod
+    def _status_error(method: str, path: str, status_code: int, detail):
+        request = httpx.Request(method, BASE_URL + path)
+        response = httpx.Response(
+            status_code, json={"detail": detail}, request=request
+        )
+        return httpx.HTTPStatusError(
+            f"{status_code} for {method} {path}", request=request, response=response
+        )
+
+    async def close(self) -> None:
+        await engine.dispose()
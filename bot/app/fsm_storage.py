@@ -0,0 +1,234 @@
+"""
+FSM storage на локальном SQLite (WAL) вместо MemoryStorage.
+
+Зачем:
+- MemoryStorage держит каждый недописанный диалог в RAM навсегда
+  и теряет всё при рестарте/деплое;
+- здесь состояние переживает рестарт, а память ограничена.
+
+Как устроено:
+- горячий слой — LRU в памяти (не больше cache_size ключей, включая
+  "пустые" ключи, чтобы не ходить в SQLite за каждым сообщением);
+- запись write-behind: изменения копятся в dirty и раз в flush_sec
+  одной транзакцией уходят в SQLite (в отдельном потоке);
+- брошенные диалоги старше ttl_sec считаются пустыми и периодически
+  удаляются из файла.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    updated_at: float = 0.0
+
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        path: str,
+        *,
+        ttl_sec: float = 7 * 24 * 3600,
+        cache_size: int = 10_000,
+        flush_sec: float = 1.0,
+        vacuum_sec: float = 600.0,
+        key_builder: KeyBuilder | None = None,
+    ) -> None:
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.cache_size = cache_size
+        self.flush_sec = flush_sec
+        self.vacuum_sec = vacuum_sec
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        with self._conn_lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fsm ("
+                " key TEXT PRIMARY KEY,"
+                " state TEXT,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_fsm_updated_at ON fsm (updated_at)"
+            )
+
+        self._hot: OrderedDict[str, _Record] = OrderedDict()
+        # key -> запись, ещё не сброшенная на диск
+        self._dirty: dict[str, _Record] = {}
+        # key -> запись, которая пишется прямо сейчас
+        self._inflight: dict[str, _Record] = {}
+        self._flusher: asyncio.Task | None = None
+
+    # ---- BaseStorage ----
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self.key_builder.build(key)
+        rec = await self._get(k)
+        rec.state = state.state if isinstance(state, State) else state
+        self._put(k, rec)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        rec = await self._get(self.key_builder.build(key))
+        return rec.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        k = self.key_builder.build(key)
+        rec = await self._get(k)
+        rec.data = data.copy()
+        self._put(k, rec)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        rec = await self._get(self.key_builder.build(key))
+        return rec.data.copy()
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        with self._conn_lock:
+            self._conn.close()
+
+    # ---- cache ----
+    def _expired(self, rec: _Record) -> bool:
+        return rec.updated_at < time.time() - self.ttl_sec
+
+    def _cached(self, k: str) -> _Record | None:
+        rec = self._dirty.get(k) or self._inflight.get(k)
+        if rec is None:
+            rec = self._hot.get(k)
+        if rec is not None:
+            self._remember(k, rec)
+        return rec
+
+    async def _get(self, k: str) -> _Record:
+        rec = self._cached(k)
+        if rec is None:
+            loaded = await asyncio.to_thread(self._load, k)
+            # пока читали диск, ключ могли записать — свежая версия важнее
+            rec = self._cached(k)
+            if rec is None:
+                rec = loaded or _Record(updated_at=time.time())
+                self._remember(k, rec)
+
+        if not rec.is_empty() and self._expired(rec):
+            rec = _Record(updated_at=time.time())
+            self._put(k, rec)
+        return rec
+
+    def _remember(self, k: str, rec: _Record) -> None:
+        self._hot[k] = rec
+        self._hot.move_to_end(k)
+        while len(self._hot) > self.cache_size:
+            # грязные записи не потеряются: они лежат в _dirty до flush
+            self._hot.popitem(last=False)
+
+    def _put(self, k: str, rec: _Record) -> None:
+        rec.updated_at = time.time()
+        self._remember(k, rec)
+        self._dirty[k] = rec
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    # ---- write-behind ----
+    async def _flush_loop(self) -> None:
+        last_vacuum = time.time()
+        while True:
+            await asyncio.sleep(self.flush_sec)
+            try:
+                await self.flush()
+                if time.time() - last_vacuum >= self.vacuum_sec:
+                    await asyncio.to_thread(self._vacuum)
+                    last_vacuum = time.time()
+            except Exception:
+                logger.exception("FSM storage flush failed")
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+
+        batch, self._dirty = self._dirty, {}
+        self._inflight = batch
+        # сериализуем в event loop: запись могут поменять, пока поток пишет
+        upserts = []
+        deletes = []
+        for k, rec in batch.items():
+            if rec.is_empty():
+                deletes.append((k,))
+            else:
+                upserts.append(
+                    (k, rec.state, json.dumps(rec.data, default=str), rec.updated_at)
+                )
+        try:
+            await asyncio.to_thread(self._write, upserts, deletes)
+        except Exception:
+            # не теряем изменения: вернём то, что не перезаписали после снимка
+            for k, rec in batch.items():
+                self._dirty.setdefault(k, rec)
+            raise
+        finally:
+            self._inflight = {}
+
+    # ---- sqlite (выполняется в потоке) ----
+    def _load(self, k: str) -> _Record | None:
+        with self._conn_lock:
+            row = self._conn.execute(
+                "SELECT state, data, updated_at FROM fsm WHERE key = ?", (k,)
+            ).fetchone()
+        if row is None:
+            return None
+        state, data, updated_at = row
+        return _Record(state=state, data=json.loads(data), updated_at=updated_at)
+
+    def _write(self, upserts: list[tuple], deletes: list[tuple]) -> None:
+        with self._conn_lock, self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET"
+                    " state = excluded.state,"
+                    " data = excluded.data,"
+                    " updated_at = excluded.updated_at",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+
+    def _vacuum(self) -> None:
+        cutoff = time.time() - self.ttl_sec
+        with self._conn_lock, self._conn:
+            self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (cutoff,))
@@ -1,57 +1,376 @@
 import asyncio
 import os
 import re
+import socket
+import tempfile
+import time
+from collections import OrderedDict
 
 
 import httpx
 
 # from fastapi import status
 from datetime import datetime
+from zoneinfo import ZoneInfo
 from httpx import RequestError, HTTPStatusError
 from http import HTTPStatus
 from aiogram import Bot, Dispatcher, F, Router
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import CallbackQuery, FSInputFile, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.exceptions import TelegramNetworkError
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
 from dotenv import load_dotenv
 
+from concurrency import ChatOrderedIsolation
+from fsm_storage import SQLiteStorage
+from reminders import LeaseReminderWorker, ReminderScheduler
+from send_queue import SendQueue, ThrottlingRequestMiddleware
+from webhook import run_webhook
+
 load_dotenv()
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+# http — backend отдельным сервисом; embedded — репозитории backend в этом
+# же процессе (см. embedded.py), HTTP к нему не ходит
+BACKEND_MODE = os.getenv("BACKEND_MODE", "http")
 CB_NOOP = "noop"
 
+# пул соединений к backend (один клиент на весь процесс бота)
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3"))
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_MAX_KEEPALIVE = int(os.getenv("BACKEND_MAX_KEEPALIVE", "20"))
+BACKEND_KEEPALIVE_EXPIRY = float(os.getenv("BACKEND_KEEPALIVE_EXPIRY", "30"))
+
+_backend_client: httpx.AsyncClient | None = None
+_embedded = None  # embedded.EmbeddedBackend при BACKEND_MODE=embedded
+
+# напоминания: та же таймзона, что и у backend (due_at хранится naive в APP_TZ)
+APP_TZ = ZoneInfo(os.getenv("APP_TZ", "UTC"))
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "1") == "1"
+# local — окно в памяти одного процесса; lease — несколько воркеров через claim/ack
+REMINDERS_MODE = os.getenv("REMINDERS_MODE", "local")
+REMINDERS_WINDOW_SEC = float(os.getenv("REMINDERS_WINDOW_SEC", "600"))
+REMINDERS_GRACE_SEC = float(os.getenv("REMINDERS_GRACE_SEC", "60"))
+# как часто перечитывать окно целиком (задачи, созданные не через бота)
+REMINDERS_RESYNC_SEC = float(os.getenv("REMINDERS_RESYNC_SEC", "60"))
+REMINDERS_WORKER_ID = os.getenv(
+    "REMINDERS_WORKER_ID", f"{socket.gethostname()}-{os.getpid()}"
+)
+REMINDERS_LEASE_SEC = int(os.getenv("REMINDERS_LEASE_SEC", "60"))
+REMINDERS_POLL_SEC = float(os.getenv("REMINDERS_POLL_SEC", "1"))
+
+_reminders: ReminderScheduler | LeaseReminderWorker | None = None
+
+# FSM: sqlite (переживает рестарт, память ограничена) или memory (для отладки)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_DB_PATH = os.getenv("FSM_DB_PATH", "fsm.sqlite3")
+FSM_TTL_SEC = float(os.getenv("FSM_TTL_SEC", str(7 * 24 * 3600)))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_FLUSH_SEC = float(os.getenv("FSM_FLUSH_SEC", "1"))
+
+# обработка апдейтов: сколько хендлеров одновременно и сколько задач в очереди
+UPDATES_CONCURRENCY = int(os.getenv("UPDATES_CONCURRENCY", "32"))
+UPDATES_MAX_PENDING = int(os.getenv("UPDATES_MAX_PENDING", "1000"))
+
+# лимиты исходящих сообщений Telegram
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_GROUP_RATE_PER_MIN = float(os.getenv("TG_GROUP_RATE_PER_MIN", "20"))
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "3"))
+
+# polling — один потребитель; webhook — aiohttp-сервер (одна реплика; для
+# нескольких нужны общее FSM-хранилище и REMINDERS_MODE=lease, см. webhook.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# регистрировать webhook в Telegram на старте (достаточно одной реплики)
+WEBHOOK_SET = os.getenv("WEBHOOK_SET", "1") == "1"
+
+# today: последний ответ + ETag на (telegram_id, path) -> If-None-Match / 304
+TODAY_ETAG_CACHE_SIZE = int(os.getenv("TODAY_ETAG_CACHE_SIZE", "10000"))
+_today_etags: OrderedDict[tuple[int, str], tuple[str, dict]] = OrderedDict()
+
+# последний отрисованный today: (telegram_id, mode) -> (expires_at, {id: task});
+# карточка задачи берётся отсюда. TTL короткий — команда могла поменять задачи,
+# свои изменения (POST/PATCH с telegram_id) сбрасывают кэш сразу
+TODAY_CACHE_TTL = float(os.getenv("TODAY_CACHE_TTL", "60"))
+TODAY_CACHE_SIZE = int(os.getenv("TODAY_CACHE_SIZE", "10000"))
+_today_tasks: OrderedDict[tuple[int, str], tuple[float, dict[int, dict]]] = (
+    OrderedDict()
+)
+
+# /start: telegram_id -> hash(username, first_name) последнего успешного upsert
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+_profile_fingerprints: OrderedDict[int, int] = OrderedDict()
+
+# выгрузка задач документом: Bot API не принимает файлы больше 50 МБ
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+
 
 # ---- helpers ----
+async def open_backend_client() -> None:
+    """Создаёт общий keep-alive клиент (вызывается на dp.startup)."""
+    global _backend_client, _embedded
+    if _backend_client is not None:
+        return
+
+    if BACKEND_MODE == "embedded":
+        # импорт здесь: в http-режиме зависимости backend боту не нужны
+        from embedded import BASE_URL, EmbeddedBackend
+
+        _embedded = EmbeddedBackend()
+        # пути без in-process обработчика — в то же приложение, без сети
+        _backend_client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=_embedded.app),
+            base_url=BASE_URL,
+            timeout=httpx.Timeout(BACKEND_TIMEOUT),
+        )
+        return
+
+    _backend_client = httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=BACKEND_MAX_CONNECTIONS,
+            max_keepalive_connections=BACKEND_MAX_KEEPALIVE,
+            keepalive_expiry=BACKEND_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def close_backend_client() -> None:
+    """Закрывает общий клиент (вызывается на dp.shutdown)."""
+    global _backend_client, _embedded
+    if _backend_client is None:
+        return
+
+    client, _backend_client = _backend_client, None
+    await client.aclose()
+
+    if _embedded is not None:
+        embedded, _embedded = _embedded, None
+        await embedded.close()
+
+
+def backend_client() -> httpx.AsyncClient:
+    if _backend_client is None:
+        raise RuntimeError("Backend client is not opened. Is dp.startup wired?")
+    return _backend_client
+
+
+async def start_reminders(bot: Bot) -> None:
+    """Запускает планировщик напоминаний (dp.startup, после backend-клиента)."""
+    global _reminders
+    if not REMINDERS_ENABLED or _reminders is not None:
+        return
+
+    if REMINDERS_MODE == "lease":
+        _reminders = LeaseReminderWorker(
+            bot,
+            post=backend_post,
+            worker_id=REMINDERS_WORKER_ID,
+            lease_sec=REMINDERS_LEASE_SEC,
+            poll_sec=REMINDERS_POLL_SEC,
+        )
+    else:
+        _reminders = ReminderScheduler(
+            bot,
+            get=backend_get,
+            post=backend_post,
+            tz=APP_TZ,
+            window_sec=REMINDERS_WINDOW_SEC,
+            grace_sec=REMINDERS_GRACE_SEC,
+            resync_sec=REMINDERS_RESYNC_SEC,
+        )
+    _reminders.start()
+
+
+async def stop_reminders() -> None:
+    global _reminders
+    if _reminders is None:
+        return
+
+    scheduler, _reminders = _reminders, None
+    await scheduler.stop()
+
+
 async def backend_get(path: str, *, params: dict) -> dict | list:
     """GET JSON from backend."""
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(f"{BACKEND_URL}{path}", params=params)
+    try:
+        if _embedded is not None and _embedded.has_route("GET", path):
+            return await _embedded.request("GET", path, params=params)
+        r = await backend_client().get(path, params=params)
         r.raise_for_status()
-        return r.json()
+    except HTTPStatusError as e:
+        _forget_lost_user(e, params, None)
+        raise
+    return r.json()
+
+
+def _remember_today(tg_id: int, mode: str, data: dict) -> None:
+    if TODAY_CACHE_TTL <= 0:
+        return
+    tasks = {t["id"]: t for t in data.get("open", []) + data.get("done", [])}
+    key = (tg_id, mode)
+    _today_tasks[key] = (time.monotonic() + TODAY_CACHE_TTL, tasks)
+    _today_tasks.move_to_end(key)
+    while len(_today_tasks) > TODAY_CACHE_SIZE:
+        _today_tasks.popitem(last=False)
+
+
+def _cached_task(tg_id: int, mode: str, task_id: int) -> dict | None:
+    item = _today_tasks.get((tg_id, mode))
+    if item is None:
+        return None
+    expires_at, tasks = item
+    if expires_at < time.monotonic():
+        del _today_tasks[(tg_id, mode)]
+        return None
+    return tasks.get(task_id)
+
+
+def _forget_today(params: dict | None, json: dict | None) -> None:
+    """Любая запись от имени пользователя делает его today-кэш устаревшим."""
+    tg_id = (params or {}).get("telegram_id") or (json or {}).get("telegram_id")
+    if tg_id is None:
+        return
+    _today_tasks.pop((tg_id, "personal"), None)
+    _today_tasks.pop((tg_id, "team"), None)
+
+
+def _forget_lost_user(
+    e: HTTPStatusError, params: dict | None, json: dict | None
+) -> None:
+    """
+    Backend ответил 404 "User not found" (база очищена, пользователь удалён) —
+    сбрасываем отпечаток профиля, чтобы следующий /start снова сделал upsert.
+    """
+    if e.response.status_code != HTTPStatus.NOT_FOUND:
+        return
+    try:
+        detail = e.response.json().get("detail")
+    except ValueError:
+        return
+    if not (isinstance(detail, str) and detail.startswith("User not found")):
+        return
+    tg_id = (params or {}).get("telegram_id") or (json or {}).get("telegram_id")
+    if tg_id is not None:
+        _profile_fingerprints.pop(int(tg_id), None)
+
+
+async def backend_get_today(path: str, *, tg_id: int) -> dict:
+    """
+    GET today-списка с If-None-Match: на 304 backend не читает задачи,
+    а бот перерисовывает сохранённый ответ.
+    """
+    if _embedded is not None and _embedded.has_route("GET", path):
+        # в процессе нечего экономить: данные не сериализуются
+        return await _embedded.request("GET", path, params={"telegram_id": tg_id})
+
+    key = (tg_id, path)
+    cached = _today_etags.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else None
+
+    r = await backend_client().get(
+        path, params={"telegram_id": tg_id}, headers=headers
+    )
+    if r.status_code == HTTPStatus.NOT_MODIFIED and cached:
+        _today_etags.move_to_end(key)
+        return cached[1]
+
+    try:
+        r.raise_for_status()
+    except HTTPStatusError as e:
+        _forget_lost_user(e, {"telegram_id": tg_id}, None)
+        raise
+    data = r.json()
+    etag = r.headers.get("ETag")
+    if etag:
+        _today_etags[key] = (etag, data)
+        _today_etags.move_to_end(key)
+        while len(_today_etags) > TODAY_ETAG_CACHE_SIZE:
+            _today_etags.popitem(last=False)
+    return data
 
 
 async def backend_post(
     path: str, *, params: dict | None = None, json: dict | None = None
 ):
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.post(f"{BACKEND_URL}{path}", params=params, json=json)
+    _forget_today(params, json)
+    try:
+        if _embedded is not None and _embedded.has_route("POST", path):
+            return await _embedded.request("POST", path, params=params, json=json)
+        r = await backend_client().post(path, params=params, json=json)
         r.raise_for_status()
-        return r.json() if r.content else {}
+    except HTTPStatusError as e:
+        _forget_lost_user(e, params, json)
+        raise
+    return r.json() if r.content else {}
 
 
-async def backend_patch(path: str, *, params: dict) -> dict:
+async def backend_patch(
+    path: str, *, params: dict, json: dict | None = None
+) -> dict | list:
     """PATCH JSON from backend."""
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.patch(f"{BACKEND_URL}{path}", params=params)
+    _forget_today(params, json)
+    try:
+        if _embedded is not None and _embedded.has_route("PATCH", path):
+            return await _embedded.request("PATCH", path, params=params, json=json)
+        r = await backend_client().patch(path, params=params, json=json)
         r.raise_for_status()
-        return r.json()
+    except HTTPStatusError as e:
+        _forget_lost_user(e, params, json)
+        raise
+    return r.json()
+
+
+async def backend_download(path: str, *, params: dict, dest) -> int:
+    """
+    Скачать ответ backend потоком в файл dest (без загрузки целиком в память).
+    Возвращает число записанных байт; больше EXPORT_MAX_BYTES -> ValueError.
+    """
+    size = 0
+    async with backend_client().stream("GET", path, params=params) as r:
+        if r.is_error:
+            await r.aread()
+            try:
+                r.raise_for_status()
+            except HTTPStatusError as e:
+                _forget_lost_user(e, params, None)
+                raise
+        async for chunk in r.aiter_bytes():
+            size += len(chunk)
+            if size > EXPORT_MAX_BYTES:
+                raise ValueError("export is too large")
+            dest.write(chunk)
+    return size
 
 
 # ---------- Utils ----------
+async def edit_or_answer(message: Message, text: str, **kwargs) -> None:
+    """
+    Редактирует сообщение, а если его нельзя редактировать — шлёт новое.
+
+    "message is not modified" — не ошибка: содержимое уже такое же,
+    второе сообщение отправлять не нужно.
+    """
+    try:
+        await message.edit_text(text, **kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
+        await message.answer(text, **kwargs)
+
+
 def format_due_hhmm(iso_dt: str) -> str:
     return datetime.fromisoformat(iso_dt).strftime("%H:%M")
 
@@ -121,12 +440,13 @@ def mode_menu_kb(mode: str):
         kb.button(text="👥 Мои команды", callback_data="team:my")
         kb.button(text="🔗 Код приглашения", callback_data="team:invite")
 
+    kb.button(text="📤 Экспорт задач", callback_data=f"task:export:{mode}")
     kb.button(text="⬅️ Выбор режима", callback_data="mode:choose")
 
     if mode == "team":
-        kb.adjust(2, 2, 1)
+        kb.adjust(2, 2, 1, 1)
     else:
-        kb.adjust(2, 1)
+        kb.adjust(2, 1, 1)
 
     return kb.as_markup()
 
@@ -157,19 +477,35 @@ def team_work_kb():
 router = Router()
 
 
+def _profile_changed(tg_id: int, fingerprint: int) -> bool:
+    """True, если профиль ещё не отправляли в backend или он изменился."""
+    if _profile_fingerprints.get(tg_id) != fingerprint:
+        return True
+    _profile_fingerprints.move_to_end(tg_id)
+    return False
+
+
+def _remember_profile(tg_id: int, fingerprint: int) -> None:
+    _profile_fingerprints[tg_id] = fingerprint
+    _profile_fingerprints.move_to_end(tg_id)
+    while len(_profile_fingerprints) > PROFILE_CACHE_SIZE:
+        _profile_fingerprints.popitem(last=False)
+
+
 # ---------- /start ----------
 @router.message(CommandStart())
 async def start(message: Message) -> None:
-    # 1) Upsert user в backend
+    # 1) Upsert user в backend — только если профиль изменился с прошлого раза
     payload = {
         "telegram_id": message.from_user.id,
         "username": message.from_user.username,
         "first_name": message.from_user.first_name,
     }
+    fingerprint = hash((payload["username"], payload["first_name"]))
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.post(f"{BACKEND_URL}/users/upsert", json=payload)
-        r.raise_for_status()
+    if _profile_changed(payload["telegram_id"], fingerprint):
+        await backend_post("/users/upsert", json=payload)
+        _remember_profile(payload["telegram_id"], fingerprint)
 
     # 2) Показать выбор режима
     await message.answer("Выбери режим работы:", reply_markup=mode_choose_kb())
@@ -314,17 +650,9 @@ async def on_team_create_nickname(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
 
-    # На всякий случай активируем созданную команду
-    team_id = team.get("id")
-    if team_id:
-        try:
-            await backend_post(
-                f"/teams/{team_id}/activate", params={"telegram_id": tg_id}
-            )
-        except Exception:
-            pass
-
+    # POST /teams сам делает команду активной у создателя
     await state.clear()
+    team_id = team.get("id")
     await message.answer(f"Команда создана ✅ {team.get('name')} (#{team_id})")
     await message.answer("Режим: Команда ✅", reply_markup=team_work_kb())
 
@@ -409,7 +737,7 @@ async def render_today(message, *, tg_id: int, mode: str) -> None:
     """Рисует список Today (open/done) для personal/team."""
     try:
         path = "/tasks/personal/today" if mode == "personal" else "/tasks/team/today"
-        data = await backend_get(path, params={"telegram_id": tg_id})
+        data = await backend_get_today(path, tg_id=tg_id)
     except RequestError:
         await message.answer("Backend недоступен 😕 Попробуй позже.")
         return
@@ -417,6 +745,8 @@ async def render_today(message, *, tg_id: int, mode: str) -> None:
         await message.answer(f"Ошибка backend: {e.response.status_code}")
         return
 
+    _remember_today(tg_id, mode, data)
+
     open_tasks = data.get("open", [])
     done_tasks = data.get("done", [])
 
@@ -445,13 +775,12 @@ async def render_today(message, *, tg_id: int, mode: str) -> None:
             callback_data=f"done_task:{mode}:{task_id}",
         )
 
+    if open_tasks:
+        kb.button(text="⏭ Всё на завтра", callback_data=f"today_all_tomorrow:{mode}")
     kb.button(text="⬅ В меню", callback_data=f"menu:{mode}")
     kb.adjust(1)
 
-    try:
-        await message.edit_text("Задачи на сегодня:", reply_markup=kb.as_markup())
-    except Exception:
-        await message.answer("Задачи на сегодня:", reply_markup=kb.as_markup())
+    await edit_or_answer(message, "Задачи на сегодня:", reply_markup=kb.as_markup())
 
 
 @router.callback_query(F.data.startswith("task:today:"))
@@ -466,6 +795,17 @@ async def on_today(callback: CallbackQuery) -> None:
 # +++++++++ HANDLER TASK DETAILS (personal/team) +++++++++
 
 
+async def _get_task(tg_id: int, mode: str, task_id: int) -> dict:
+    """Карточка задачи: из последнего today-списка, на промахе — из backend."""
+    task = _cached_task(tg_id, mode, task_id)
+    if task is not None:
+        return task
+    path = (
+        f"/tasks/personal/{task_id}" if mode == "personal" else f"/tasks/team/{task_id}"
+    )
+    return await backend_get(path, params={"telegram_id": tg_id})
+
+
 def _parse_mode_task_id(data: str) -> tuple[str, int] | None:
     # ожидаем "today_task:{mode}:{id}" или "done_task:{mode}:{id}"
     parts = (data or "").split(":")
@@ -491,13 +831,8 @@ async def on_today_task(callback: CallbackQuery) -> None:
         return
     mode, task_id = parsed
 
-    # правильный endpoint
-    path = (
-        f"/tasks/personal/{task_id}" if mode == "personal" else f"/tasks/team/{task_id}"
-    )
-
     try:
-        t = await backend_get(path, params={"telegram_id": tg_id})
+        t = await _get_task(tg_id, mode, task_id)
     except RequestError:
         await callback.message.answer("Backend недоступен 😕 Попробуй позже.")
         await callback.answer()
@@ -525,10 +860,7 @@ async def on_today_task(callback: CallbackQuery) -> None:
     kb.button(text="⬅ Назад к списку", callback_data=f"task:today:{mode}")
     kb.adjust(2, 1)
 
-    try:
-        await callback.message.edit_text(text, reply_markup=kb.as_markup())
-    except Exception:
-        await callback.message.answer(text, reply_markup=kb.as_markup())
+    await edit_or_answer(callback.message, text, reply_markup=kb.as_markup())
     await callback.answer()
 
 
@@ -543,12 +875,8 @@ async def on_done_task(callback: CallbackQuery) -> None:
         return
     mode, task_id = parsed
 
-    path = (
-        f"/tasks/personal/{task_id}" if mode == "personal" else f"/tasks/team/{task_id}"
-    )
-
     try:
-        t = await backend_get(path, params={"telegram_id": tg_id})
+        t = await _get_task(tg_id, mode, task_id)
     except RequestError:
         await callback.message.answer("Backend недоступен 😕 Попробуй позже.")
         await callback.answer()
@@ -571,10 +899,7 @@ async def on_done_task(callback: CallbackQuery) -> None:
     kb.button(text="⬅ Назад к списку", callback_data=f"task:today:{mode}")
     kb.adjust(1)
 
-    try:
-        await callback.message.edit_text(text, reply_markup=kb.as_markup())
-    except Exception:
-        await callback.message.answer(text, reply_markup=kb.as_markup())
+    await edit_or_answer(callback.message, text, reply_markup=kb.as_markup())
     await callback.answer()
 
 
@@ -623,6 +948,9 @@ async def on_task_done(callback: CallbackQuery) -> None:
         )
         return
 
+    if _reminders is not None:
+        _reminders.discard(task_id)
+
     await render_today(callback.message, tg_id=tg_id, mode=mode)
     await callback.answer("Готово ✅")
 
@@ -655,10 +983,82 @@ async def on_task_tomorrow(callback: CallbackQuery) -> None:
         )
         return
 
+    if _reminders is not None:
+        _reminders.discard(task_id)
+
     await render_today(callback.message, tg_id=tg_id, mode=mode)
     await callback.answer("Перенёс на завтра ⏭")
 
 
+# Все открытые задачи на сегодня -> на завтра: один batch-запрос вместо N
+@router.callback_query(F.data.startswith("today_all_tomorrow:"))
+async def on_today_all_tomorrow(callback: CallbackQuery) -> None:
+    tg_id = callback.from_user.id
+    mode = (callback.data or "").split(":")[-1]
+    if mode not in ("personal", "team"):
+        await callback.answer()
+        return
+
+    try:
+        data = await backend_get(f"/tasks/{mode}/today", params={"telegram_id": tg_id})
+        task_ids = [t["id"] for t in data.get("open", [])]
+        if task_ids:
+            await backend_patch(
+                f"/tasks/{mode}/tomorrow",
+                params={"telegram_id": tg_id},
+                json={"task_ids": task_ids},
+            )
+    except RequestError:
+        await callback.answer("Backend недоступен 😕", show_alert=True)
+        return
+    except HTTPStatusError as e:
+        await callback.answer(
+            f"Ошибка backend: {e.response.status_code}", show_alert=True
+        )
+        return
+
+    if _reminders is not None:
+        for task_id in task_ids:
+            _reminders.discard(task_id)
+
+    await render_today(callback.message, tg_id=tg_id, mode=mode)
+    await callback.answer(f"Перенёс на завтра: {len(task_ids)} ⏭")
+
+
+# +++++++++ EXPORT (personal/team) +++++++++
+
+
+@router.callback_query(F.data.startswith("task:export:"))
+async def on_task_export(callback: CallbackQuery) -> None:
+    """Вся история задач CSV-документом: backend стримит, бот пишет во временный файл."""
+    tg_id = callback.from_user.id
+    mode = (callback.data or "").split(":")[-1]
+    if mode not in ("personal", "team"):
+        await callback.answer()
+        return
+
+    await callback.answer("Готовлю выгрузку…")
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            await backend_download(
+                f"/tasks/{mode}/export",
+                params={"telegram_id": tg_id, "format": "csv"},
+                dest=f,
+            )
+        await callback.message.answer_document(
+            FSInputFile(path, filename=f"tasks_{mode}.csv")
+        )
+    except RequestError:
+        await callback.message.answer("Backend недоступен 😕 Попробуй позже.")
+    except HTTPStatusError as e:
+        await callback.message.answer(f"Ошибка backend: {e.response.status_code}")
+    except ValueError:
+        await callback.message.answer("Выгрузка больше 50 МБ — Telegram её не примет.")
+    finally:
+        os.remove(path)
+
+
 # ++++++++++ MENU (personal/team) +++++++++
 
 
@@ -688,7 +1088,7 @@ async def on_join_code(message: Message, state: FSMContext) -> None:
 
     tg_id = message.from_user.id
 
-    # 1) join по коду -> получаем team_id
+    # join по коду: backend в той же транзакции делает команду активной
     try:
         data = await backend_post(
             "/teams/join",
@@ -708,18 +1108,10 @@ async def on_join_code(message: Message, state: FSMContext) -> None:
         await message.answer(f"Ошибка backend: {status} — {detail}")
         return
 
-    team_id = data.get("team_id")
-    if not team_id:
+    if not data.get("team_id"):
         await message.answer("Backend не вернул team_id. Проверь /teams/join.")
         return
 
-    # 2) activate
-    try:
-        await backend_post(f"/teams/{team_id}/activate", params={"telegram_id": tg_id})
-    except Exception:
-        await message.answer("Команду нашли, но активировать не получилось 😕")
-        return
-
     await state.clear()
     await message.answer("Режим: Команда ✅", reply_markup=team_work_kb())
 
@@ -808,32 +1200,37 @@ async def fsm_remind_at(message: Message, state: FSMContext) -> None:
 
     # 4) отправляем запрос в backend
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.post(f"{BACKEND_URL}/tasks", json=payload)
-
-            # если формат времени неверный — backend вернёт 422
-            if r.status_code == 422:
-                await message.answer(
-                    "Неверный формат времени. Пришли `18` или `18:30`.",
-                    parse_mode="Markdown",
-                )
-                return
+        task = await backend_post("/tasks", json=payload)
 
-            r.raise_for_status()
-            task = r.json()
-
-    except httpx.RequestError:
+    except RequestError:
         # backend недоступен (нет сети / контейнер упал / таймаут)
         await message.answer("Backend недоступен 😕 Попробуй позже.")
         await state.clear()
         return
 
-    except httpx.HTTPStatusError as e:
-        # любые 4xx/5xx кроме 422 (которые мы обработали выше)
+    except HTTPStatusError as e:
+        # если формат времени неверный — backend вернёт 422
+        if e.response.status_code == 422:
+            await message.answer(
+                "Неверный формат времени. Пришли `18` или `18:30`.",
+                parse_mode="Markdown",
+            )
+            return
+
+        # любые другие 4xx/5xx
         await message.answer(f"Ошибка backend: {e.response.status_code}")
         await state.clear()
         return
 
+    # если время попадает в уже загруженное окно — ставим напоминание сразу
+    if _reminders is not None and task.get("due_at"):
+        _reminders.add(
+            task_id=task["id"],
+            chat_id=message.from_user.id,
+            title=task["title"],
+            due_at=task["due_at"],
+        )
+
     # 5) режим берём из FSM (запомнили его при нажатии "Добавить задачу")
     mode = data.get("mode", "personal")
 
@@ -860,18 +1257,72 @@ async def wait_telegram(bot: Bot, tries: int = 10) -> None:
     await bot.get_me(request_timeout=20)
 
 
+def make_fsm_storage() -> BaseStorage:
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(
+        FSM_DB_PATH,
+        ttl_sec=FSM_TTL_SEC,
+        cache_size=FSM_CACHE_SIZE,
+        flush_sec=FSM_FLUSH_SEC,
+    )
+
+
 async def main() -> None:
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise RuntimeError("BOT_TOKEN is not set. Put it into bot/.env")
 
     bot = Bot(token=token)
+    bot.session.middleware(
+        ThrottlingRequestMiddleware(
+            SendQueue(
+                global_rate=TG_GLOBAL_RATE,
+                chat_rate=TG_CHAT_RATE,
+                group_rate=TG_GROUP_RATE_PER_MIN / 60,
+                chat_burst=TG_CHAT_BURST,
+            )
+        )
+    )
 
-    dp = Dispatcher(storage=MemoryStorage())
+    # апдейты разных чатов — параллельно (до UPDATES_CONCURRENCY),
+    # одного чата — строго по порядку
+    dp = Dispatcher(
+        storage=make_fsm_storage(),
+        events_isolation=ChatOrderedIsolation(UPDATES_CONCURRENCY),
+    )
     dp.include_router(router)
 
+    # один пул соединений к backend на всё время жизни диспетчера
+    dp.startup.register(open_backend_client)
+    dp.startup.register(start_reminders)
+    dp.shutdown.register(stop_reminders)
+    dp.shutdown.register(close_backend_client)
+
     await wait_telegram(bot)
-    await dp.start_polling(bot)
+
+    if BOT_MODE == "webhook":
+        await run_webhook(
+            dp,
+            bot,
+            base_url=WEBHOOK_BASE_URL,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT,
+            queue_size=WEBHOOK_QUEUE_SIZE,
+            workers=UPDATES_CONCURRENCY,
+            set_webhook=WEBHOOK_SET,
+        )
+        return
+
+    # getUpdates не работает, пока у бота висит webhook
+    await bot.delete_webhook()
+    await dp.start_polling(
+        bot,
+        handle_as_tasks=True,
+        tasks_concurrency_limit=UPDATES_MAX_PENDING,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,343 @@
+"""
+Планировщик напоминаний по due_at.
+
+Как устроено:
+- в памяти держим только ближайшее окно задач (min-heap по времени срабатывания);
+- окно подгружается лениво из backend (GET /tasks/due) кусками по window_sec,
+  backend отдаёт его по индексу, без скана всей таблицы;
+- каждые resync_sec окно перечитывается целиком от `now - grace_sec`:
+  так подхватываются задачи, созданные не через этого бота (batch, API),
+  а дубли отсекаются по _scheduled и по ещё не подтверждённым отправкам;
+- сбой отправки (сеть, 5xx, исчерпанные повторы SendQueue) возвращает
+  напоминание в heap с экспоненциальной паузой от retry_sec;
+- после рестарта окно просто строится заново от `now - grace_sec`;
+  отправленные подтверждаются (POST /tasks/reminders/ack) и повторно не приходят;
+- между срабатываниями корутина спит до ближайшего события (или до poke),
+  так что в простое CPU почти не тратится.
+
+Для нескольких процессов есть LeaseReminderWorker: вместо локального окна он
+забирает наступившие задачи в аренду (POST /tasks/reminders/claim), так что
+воркеры делят поток напоминаний без дублей и потерь.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, tzinfo
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from send_queue import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+BackendCall = Callable[..., Awaitable[dict | list]]
+
+# бот заблокирован / чат удалён или не найден: повтор не поможет,
+# такое напоминание подтверждаем, иначе оно возвращалось бы вечно
+FINAL_SEND_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+
+def reminder_text(title: str, due_at: datetime) -> str:
+    return f"⏰ Напоминание: {title}\nВремя: {due_at.strftime('%H:%M')}"
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        get: BackendCall,
+        post: BackendCall,
+        tz: tzinfo,
+        window_sec: float = 600.0,
+        page_size: int = 500,
+        grace_sec: float = 60.0,
+        senders: int = 8,
+        retry_sec: float = 5.0,
+        resync_sec: float = 60.0,
+    ) -> None:
+        self.bot = bot
+        self.get = get
+        self.post = post
+        self.tz = tz
+        self.window_sec = window_sec
+        self.page_size = page_size
+        self.grace_sec = grace_sec
+        self.senders = senders
+        self.retry_sec = retry_sec
+        self.resync_sec = resync_sec
+
+        # (ts, task_id, chat_id, title, due_ts); актуальность проверяем по
+        # _scheduled; ts расходится с due_ts только у повторов после сбоя
+        self._heap: list[tuple[float, int, int, str, float]] = []
+        # task_id -> ts; запись в heap без пары здесь считается отменённой
+        self._scheduled: dict[int, float] = {}
+        # отданы отправителям, но ещё не подтверждены: перечитанное окно
+        # не должно поставить их второй раз
+        self._inflight: set[int] = set()
+        # task_id -> число неудачных отправок подряд (для паузы перед повтором)
+        self._failures: dict[int, int] = {}
+        self._loaded_until = 0.0
+        self._resync_at = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._outbox: asyncio.Queue[tuple[float, int, int, str, float]] = (
+            asyncio.Queue()
+        )
+        self._acks: list[int] = []
+        self._tasks: list[asyncio.Task] = []
+
+    # ---- time helpers ----
+    def _to_ts(self, iso_dt: str) -> float:
+        return datetime.fromisoformat(iso_dt).replace(tzinfo=self.tz).timestamp()
+
+    def _to_local_iso(self, ts: float) -> str:
+        return datetime.fromtimestamp(ts, self.tz).replace(tzinfo=None).isoformat()
+
+    # ---- public API ----
+    def start(self) -> None:
+        self._loaded_until = time.time() - self.grace_sec
+        self._resync_at = time.time() + self.resync_sec
+        self._tasks.append(asyncio.create_task(self._run()))
+        for _ in range(self.senders):
+            self._tasks.append(asyncio.create_task(self._sender()))
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def add(self, *, task_id: int, chat_id: int, title: str, due_at: str) -> None:
+        """
+        Добавить задачу, созданную после загрузки окна.
+
+        Если due_at за пределами окна — ничего не делаем: задача придёт
+        из backend, когда окно до неё доедет. Задачи других клиентов
+        подхватит перечитывание окна (resync_sec), add лишь убирает задержку.
+        """
+        ts = self._to_ts(due_at)
+        if ts >= self._loaded_until:
+            return
+        self._push(ts, task_id, chat_id, title, ts)
+        self._wakeup.set()
+
+    def discard(self, task_id: int) -> None:
+        """Отменить напоминание (задача выполнена / перенесена)."""
+        self._scheduled.pop(task_id, None)
+        self._failures.pop(task_id, None)
+
+    # ---- internals ----
+    def _push(
+        self, ts: float, task_id: int, chat_id: int, title: str, due_ts: float
+    ) -> None:
+        if task_id in self._inflight or self._scheduled.get(task_id) == ts:
+            return
+        self._scheduled[task_id] = ts
+        heapq.heappush(self._heap, (ts, task_id, chat_id, title, due_ts))
+
+    def _retry(self, entry: tuple[float, int, int, str, float]) -> None:
+        """Вернуть неотправленное напоминание в heap с экспоненциальной паузой."""
+        _, task_id, chat_id, title, due_ts = entry
+        self._inflight.discard(task_id)
+        if task_id in self._scheduled:
+            return  # пока отправляли, задачу переставили заново
+        failures = self._failures.get(task_id, 0) + 1
+        self._failures[task_id] = failures
+        delay = min(self.retry_sec * 2 ** (failures - 1), self.window_sec)
+        self._push(time.time() + delay, task_id, chat_id, title, due_ts)
+        self._wakeup.set()
+
+    async def _load_window(self, since: float, until: float) -> None:
+        params = {
+            "since": self._to_local_iso(since),
+            "until": self._to_local_iso(until),
+            "limit": self.page_size,
+        }
+        while True:
+            page = await self.get("/tasks/due", params=params)
+            for t in page:
+                if t["id"] in self._failures:
+                    continue  # ждёт повтора после сбоя, паузу не сбиваем
+                ts = self._to_ts(t["due_at"])
+                self._push(ts, t["id"], t["telegram_id"], t["title"], ts)
+            if len(page) < self.page_size:
+                return
+            last = page[-1]
+            params = {**params, "after_due_at": last["due_at"], "after_id": last["id"]}
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+
+            # подгружаем следующее окно заранее, на половине текущего;
+            # раз в resync_sec перечитываем его целиком (задачи других клиентов)
+            resync = now >= self._resync_at
+            if resync or self._loaded_until - now < self.window_sec / 2:
+                since = now - self.grace_sec if resync else self._loaded_until
+                until = max(now + self.window_sec, self._loaded_until)
+                try:
+                    await self._load_window(since, until)
+                    self._loaded_until = until
+                    if resync:
+                        self._resync_at = now + self.resync_sec
+                except Exception:
+                    logger.exception("Failed to load reminders window")
+                    await asyncio.sleep(self.retry_sec)
+                    continue
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                ts, task_id = entry[0], entry[1]
+                if self._scheduled.get(task_id) != ts:
+                    continue  # отменена или перенесена
+                del self._scheduled[task_id]
+                self._inflight.add(task_id)
+                self._outbox.put_nowait(entry)
+
+            next_ts = self._heap[0][0] if self._heap else float("inf")
+            refill_ts = min(self._loaded_until - self.window_sec / 2, self._resync_at)
+            timeout = max(0.0, min(next_ts, refill_ts) - time.time())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sender(self) -> None:
+        while True:
+            entry = await self._outbox.get()
+            _, task_id, chat_id, title, due_ts = entry
+            due_at = datetime.fromtimestamp(due_ts, self.tz)
+            try:
+                with bulk_sends():
+                    await self.bot.send_message(chat_id, reminder_text(title, due_at))
+            except FINAL_SEND_ERRORS as e:
+                logger.warning("Reminder for task %s dropped: %s", task_id, e)
+            except Exception:
+                # сеть / 5xx / повторы SendQueue исчерпаны: не теряем, повторим позже
+                logger.exception("Failed to send reminder for task %s", task_id)
+                self._retry(entry)
+                continue
+
+            self._failures.pop(task_id, None)
+            self._acks.append(task_id)
+            if self._outbox.empty() or len(self._acks) >= 100:
+                await self._flush_acks()
+
+    async def _flush_acks(self) -> None:
+        task_ids, self._acks = self._acks, []
+        if not task_ids:
+            return
+        try:
+            await self.post("/tasks/reminders/ack", json={"task_ids": task_ids})
+        except Exception:
+            # не страшно: после рестарта возможен повтор в пределах grace_sec
+            logger.exception("Failed to ack reminders %s", task_ids)
+        finally:
+            # без ack backend отдал бы их в следующем окне — это и есть повтор
+            self._inflight.difference_update(task_ids)
+
+
+class LeaseReminderWorker:
+    """
+    Воркер напоминаний для горизонтального масштабирования.
+
+    Каждый процесс периодически забирает пачку наступивших задач в аренду,
+    отправляет их и подтверждает. Неподтверждённые (упал / Telegram не принял)
+    вернутся в очередь, когда истечёт аренда.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        post: BackendCall,
+        worker_id: str,
+        batch_size: int = 100,
+        lease_sec: int = 60,
+        poll_sec: float = 1.0,
+        senders: int = 8,
+        retry_sec: float = 5.0,
+    ) -> None:
+        self.bot = bot
+        self.post = post
+        self.worker_id = worker_id
+        self.batch_size = batch_size
+        self.lease_sec = lease_sec
+        self.poll_sec = poll_sec
+        self.retry_sec = retry_sec
+        self._send_slots = asyncio.Semaphore(senders)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    # локальный планировщик умеет add/discard; здесь источник правды — backend
+    def add(self, **_: object) -> None:
+        pass
+
+    def discard(self, task_id: int) -> None:
+        pass
+
+    async def _send(self, t: dict) -> int | None:
+        async with self._send_slots:
+            due_at = datetime.fromisoformat(t["due_at"])
+            try:
+                with bulk_sends():
+                    await self.bot.send_message(
+                        t["telegram_id"], reminder_text(t["title"], due_at)
+                    )
+            except FINAL_SEND_ERRORS as e:
+                # ack как отправленное: после истечения аренды не вернётся
+                logger.warning("Reminder for task %s dropped: %s", t["id"], e)
+            except Exception:
+                # сеть / 5xx / flood: не ack, вернётся после истечения аренды
+                logger.exception("Failed to send reminder for task %s", t["id"])
+                return None
+            return t["id"]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                batch = await self.post(
+                    "/tasks/reminders/claim",
+                    params={
+                        "worker_id": self.worker_id,
+                        "limit": self.batch_size,
+                        "lease_sec": self.lease_sec,
+                    },
+                )
+            except Exception:
+                logger.exception("Failed to claim reminders")
+                await asyncio.sleep(self.retry_sec)
+                continue
+
+            sent = await asyncio.gather(*(self._send(t) for t in batch))
+            task_ids = [task_id for task_id in sent if task_id is not None]
+            if task_ids:
+                try:
+                    await self.post(
+                        "/tasks/reminders/ack",
+                        json={"worker_id": self.worker_id, "task_ids": task_ids},
+                    )
+                except Exception:
+                    # аренда истечёт и задачи уйдут повторно — лучше дубль, чем потеря
+                    logger.exception("Failed to ack reminders %s", task_ids)
+
+            # полная пачка -> очередь ещё не разобрана, берём следующую сразу
+            if len(batch) < self.batch_size:
+                await asyncio.sleep(self.poll_sec)
@@ -0,0 +1,177 @@
+"""
+Исходящие запросы в Telegram с учётом его лимитов.
+
+Подключается как request-middleware сессии бота, поэтому работает для всех
+отправок сразу (message.answer, edit_text, bot.send_message, ...):
+- глобальный token bucket (~30 сообщений/сек на бота);
+- token bucket на каждый чат (~1/сек в личке, ~20/мин в группах);
+- очередь с приоритетами: интерактивные ответы пользователю идут раньше
+  массовых рассылок (напоминания, рассылки по команде — см. bulk_sends);
+- на 429 (TelegramRetryAfter) чат ставится на паузу retry_after секунд,
+  а запрос повторяется.
+
+Запросы без chat_id (getUpdates, answerCallbackQuery, ...) не ограничиваются.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections.abc import Hashable, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+_send_priority: ContextVar[int] = ContextVar(
+    "send_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    """Отправки внутри блока уступают очередь интерактивным ответам."""
+    token = _send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: reserve() сразу списывает токен
+    и возвращает, сколько ждать до своей очереди (0 — можно сейчас).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait_time(self) -> float:
+        """Сколько ждать до свободного токена, ничего не списывая."""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        # "занимаем" токены вперёд на seconds — все следующие reserve подождут
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class SendQueue:
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 3.0,
+        max_idle_chats: int = 10_000,
+    ) -> None:
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_idle_chats = max_idle_chats
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[Hashable, TokenBucket] = {}
+
+        # (priority, seq, future): кто следующий получает глобальный токен
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_idle_chats:
+                # выкидываем полностью восстановившиеся (неактивные) чаты
+                self._chats = {k: b for k, b in self._chats.items() if not b.is_idle()}
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    async def acquire(self, chat_id: Hashable, priority: int) -> None:
+        # 1) лимит чата: резервируем своё место и ждём его (FIFO внутри чата)
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # 2) глобальный лимит: встаём в очередь с приоритетом
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await fut
+
+    def pause_chat(self, chat_id: Hashable, seconds: float) -> None:
+        self._chat_bucket(chat_id).pause(seconds)
+
+    async def _pump(self) -> None:
+        # живёт только пока есть ожидающие — в простое не крутится
+        while self._waiters:
+            delay = self._global.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():  # отправитель уже отменён
+                continue
+            self._global.reserve()
+            fut.set_result(None)
+
+
+class ThrottlingRequestMiddleware(BaseRequestMiddleware):
+    def __init__(self, queue: SendQueue, *, max_retries: int = 3) -> None:
+        self.queue = queue
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = _send_priority.get()
+        retries = 0
+        while True:
+            await self.queue.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                retries += 1
+                if retries > self.max_retries:
+                    raise
+                self.queue.pause_chat(chat_id, e.retry_after)
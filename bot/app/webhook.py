@@ -0,0 +1,132 @@
+"""
+Webhook-режим бота (aiohttp) вместо long polling.
+
+- Telegram сам присылает апдейты на WEBHOOK_BASE_URL + WEBHOOK_PATH;
+- запрос без правильного X-Telegram-Bot-Api-Secret-Token отклоняется (401);
+- апдейт сразу кладётся в ограниченную очередь и Telegram получает 200,
+  обработку делают `workers` корутин; если очередь полна — отвечаем 503,
+  и Telegram повторит доставку позже (backpressure вместо роста памяти).
+
+По умолчанию рассчитан на одну реплику. Несколько реплик за балансировщиком
+возможны только при общем FSM-хранилище (SQLiteStorage и MemoryStorage живут
+в одном процессе) и REMINDERS_MODE=lease (локальный планировщик в каждой
+реплике отправит каждое напоминание). Порядок апдейтов одного чата
+(ChatOrderedIsolation) при этом гарантируется только внутри процесса.
+"""
+
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str,
+        queue_size: int = 1000,
+        workers: int = 32,
+        **data: Any,
+    ) -> None:
+        super().__init__(
+            dispatcher,
+            bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.workers = workers
+        self._queue: asyncio.Queue[tuple[Bot, dict[str, Any]]] = asyncio.Queue(
+            maxsize=queue_size
+        )
+        self._worker_tasks: list[asyncio.Task] = []
+
+    async def _handle_request_background(
+        self, bot: Bot, request: web.Request
+    ) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        try:
+            self._queue.put_nowait((bot, update))
+        except asyncio.QueueFull:
+            logger.warning("Webhook queue is full, asking Telegram to retry")
+            return web.Response(status=503, text="Busy")
+
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _worker(self) -> None:
+        while True:
+            bot, update = await self._queue.get()
+            try:
+                await self._background_feed_update(bot=bot, update=update)
+            except Exception:
+                # dispatcher уже залогировал, воркер должен жить дальше
+                pass
+            finally:
+                self._queue.task_done()
+
+    async def close(self) -> None:
+        for t in self._worker_tasks:
+            t.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks.clear()
+        await super().close()
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    *,
+    base_url: str,
+    path: str,
+    secret_token: str,
+    host: str,
+    port: int,
+    queue_size: int,
+    workers: int,
+    set_webhook: bool = True,
+) -> None:
+    """Поднимает aiohttp-сервер и держит его до остановки процесса."""
+    if not secret_token:
+        raise RuntimeError("WEBHOOK_SECRET is not set. Put it into bot/.env")
+
+    if set_webhook:
+
+        async def register_webhook(bot: Bot) -> None:
+            await bot.set_webhook(
+                f"{base_url.rstrip('/')}{path}",
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+
+        dp.startup.register(register_webhook)
+
+    app = web.Application()
+    BoundedRequestHandler(
+        dp,
+        bot,
+        secret_token=secret_token,
+        queue_size=queue_size,
+        workers=workers,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+        logger.info("Webhook server is listening on %s:%s%s", host, port, path)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()